@@ -178,27 +178,30 @@ for i in range(20000):
     else:
        loss = loss_fn(predicted.view(-1), labels.view(-1))
 
+    # Each .item() is a host-device sync, so the loss is fetched once and reused below
+    loss_value = loss.item()
+
     # We store the model if it has the lowest fitness
     # (this is to avoid losing good results during a run that goes wild)
-    if loss < best_loss:
+    if loss_value < best_loss:
         best_model_state_dict = model.state_dict()
-        best_loss = loss
-        print('New Best: ', loss.item())
+        best_loss = loss_value
+        print('New Best: ', loss_value)
         # Uncomment to save the model during training (careful it overwrites the model folder)
         #torch.save(model.state_dict(), "models/"+name_of_gt+".mdl")
 
     # Update the loss trend indicators
-    weighted_average.append(loss.item())
+    weighted_average.append(loss_value)
 
     # Update the logs
     weighted_average_log.append(np.mean(weighted_average))
-    loss_log.append(loss.item())
+    loss_log.append(loss_value)
     n_inferences.append((n_quadrature*batch_size) // 1000000) #counted in millions
 
     # Print every i iterations
     if i % 25 == 0:
         wa_out = np.mean(weighted_average)
-        print(f"It={i}\t loss={loss.item():.3e}\t  weighted_average={wa_out:.3e}\t  c={c:.3e}")
+        print(f"It={i}\t loss={loss_value:.3e}\t  weighted_average={wa_out:.3e}\t  c={c:.3e}")
 
     # Zeroes the gradient (necessary because of things)
     optimizer.zero_grad()
@@ -211,7 +214,7 @@ for i in range(20000):
     optimizer.step()
 
     # Perform a step in LR scheduler to update LR
-    scheduler.step(loss.item())
+    scheduler.step(loss_value)
 
 # Here we restore the learned parameters of the best model of the run
 for layer in model.state_dict():
@@ -33,7 +33,7 @@ from ._validation_mascon import validation_mascon
 from ._sample_observation_points import get_target_point_sampler
 
 # Importing the mesh_conversion methods
-from ._mesh_conversion import create_mesh_from_cloud, create_mesh_from_model
+from ._mesh_conversion import create_mesh_from_cloud, create_mesh_from_model, create_mesh_from_model_no_plot
 
 # Import the labeling functions the mascons
 from ._mascon_labels import U_L, ACC_L, ACC_L_differential
@@ -13,8 +13,8 @@ class directional_encoding:
     # sp: sampled points
 
     def __call__(self, sp):
-        unit = sp / torch.norm(sp, dim=1).view(-1, 1)
-        return torch.cat((unit, torch.norm(sp, dim=1).view(-1, 1)), dim=1)
+        r = torch.linalg.vector_norm(sp, dim=1).view(-1, 1)
+        return torch.cat((sp / r, r), dim=1)
 
 
 class positional_encoding:
@@ -59,6 +59,6 @@ class spherical_coordinates:
 
     def __call__(self, sp):
         phi = torch.atan2(sp[:, 1], sp[:, 0]) / np.pi
-        r = torch.norm(sp, dim=1)
+        r = torch.linalg.vector_norm(sp, dim=1)
         theta = torch.div(sp[:, 2], r)
         return torch.cat((r.view(-1, 1), phi.view(-1, 1), theta.view(-1, 1)), dim=1)
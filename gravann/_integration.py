@@ -1,11 +1,39 @@
+import collections
+import contextlib
+import functools
 import numpy as np
 import torch
 import warnings
-import sobol_seq
+import weakref
 from gravann._encodings import direct_encoding
 
 import os
 
+# Number of target points whose integrals are evaluated together if it cannot be derived from the free GPU memory
+_TARGET_CHUNK_SIZE = 64
+
+# Number of (M,) sized tensors allocated per target when evaluating the integrals, and
+# fraction of the free GPU memory they are allowed to take
+_INTERMEDIATES_PER_TARGET = 11
+_TARGET_CHUNK_MEMORY_FRACTION = 0.5
+
+# Minimal number of Sobol points stored in the global sequence used by ACC_ld (more are drawn on demand)
+_SOBOL_POINTS_NUMBER = 200000
+
+# Global Sobol sequence (mapped to [-1,1]^3), generated on first use
+_sobol_points = None
+
+# Sobol points (mapped to [-1,1]^3) already converted to tensors, per source and device
+_sobol_cache = {}
+
+# Encoded network inputs of the most recently used (sample points, encoding) pairs
+_ENCODED_CACHE_SIZE = 4
+_encoded_cache = collections.OrderedDict()
+
+# Noise-free integration grids currently cached by _get_integration_grid (the only inputs whose encodings
+# are cached), by id
+_integration_grids = weakref.WeakValueDictionary()
+
 
 def compute_sobol_points(N=3,M=500000):
     """Generates the low-discrpancy points Sobol sequence
@@ -17,7 +45,24 @@ def compute_sobol_points(N=3,M=500000):
     Returns:
         array NxM: the points.
     """
-    return sobol_seq.i4_sobol_generate(N, M)
+    return _draw_sobol_points(N, M, torch.float64).numpy()
+
+
+def _draw_sobol_points(N, M, dtype):
+    """Draws the (unscrambled) Sobol sequence in [0,1]^N as a CPU tensor. As in sobol_seq the first point
+    (the origin) is skipped.
+
+    Args:
+        N (int): Dimension.
+        M (int): Number of points.
+        dtype (torch.dtype): dtype of the points.
+
+    Returns:
+        torch tensor: the (M,N) points
+    """
+    engine = torch.quasirandom.SobolEngine(dimension=N, scramble=False)
+    engine.fast_forward(1)
+    return engine.draw(M, dtype=dtype)
 
 # Naive Montecarlo method for the potential
 
@@ -47,20 +92,10 @@ def rho_trap(model, encoding, mask, c, N=10000):
 
     rho[mask(sample_points)] = 0.0
 
-    evaluations = rho.reshape([N, N, N])  # map to z,y,x
+    return torch.sum(rho.view(-1) * _trapezoid_weights(h, N))
 
-    # area = h / 2 * (f0 + f2)
-    int_x = h[0] / 2 * (evaluations[:, :, 0:-1] + evaluations[:, :, 1:])
-    int_x = torch.sum(int_x, dim=2)
-    int_y = h[1] / 2 * (int_x[:, 0:-1] + int_x[:, 1:])
-    int_y = torch.sum(int_y, dim=1)
-    int_z = h[2] / 2 * (int_y[0:-1] + int_y[1:])
-    int_z = torch.sum(int_z, dim=0)
 
-    return int_z
-
-
-def U_mc(target_points, model, encoding=direct_encoding(), N=3000, domain=None):
+def U_mc(target_points, model, encoding=direct_encoding(), N=3000, domain=None, out=None):
     """Plain Monte Carlo evaluation of the potential from the modelled density
 
     Args:
@@ -69,13 +104,16 @@ def U_mc(target_points, model, encoding=direct_encoding(), N=3000, domain=None):
         encoding: the encoding for the neural inputs.
         N (int): number of points.
         domain (torch.tensor): integration domain [3,2] , pass None for [-1,1]^3. Currently Not Implemented!
+        out (torch.tensor, optional): tensor of shape (len(target_points),1) the result is written into, e.g. to reuse it
+                                      across training iterations. Defaults to None (a new tensor is allocated).
     """
     if domain is not None:
         raise NotImplementedError(
             "Custom domain is not yet implemented for U_mc.")
 
-    # init result vector
-    retval = torch.empty(len(target_points), 1)
+    # init result vector (or use the one passed)
+    retval = out if out is not None else torch.empty(
+        len(target_points), 1, device=os.environ["TORCH_DEVICE"])
 
     # We generate randomly points in the [-1,1]^3 bounds
     sample_points = torch.rand(N, 3, device=os.environ["TORCH_DEVICE"]) * 2 - 1
@@ -83,16 +121,15 @@ def U_mc(target_points, model, encoding=direct_encoding(), N=3000, domain=None):
     # Evaluate Rho on the points
     rho = _compute_model_output(model, encoding, sample_points)
 
-    # Only for the points inside we accumulate the integrand (MC method)
-    for i, target_point in enumerate(target_points):
-        retval[i] = torch.sum(
-            rho/torch.norm(target_point - sample_points, dim=1).view(-1, 1)) / N
-    return - 8 * retval
+    # the mc integral in the hypercube [-1,1]^3 (volume is 8), its sign folded into the weights
+    _integrate_in_chunks(_potential_kernel_fused, target_points,
+                         sample_points, rho.view(-1) * (-8.0 / N), retval)
+    return retval
 
 # Low-discrepancy Montecarlo for the potential
 
 
-def U_ld(target_points, model, sobol_points, encoding=direct_encoding(), N=3000, noise=0., domain=None):
+def U_ld(target_points, model, sobol_points, encoding=direct_encoding(), N=3000, noise=0., domain=None, out=None):
     """Low discrepancy Monte Carlo evaluation of the potential from the modelled density
 
     Args:
@@ -103,38 +140,36 @@ def U_ld(target_points, model, sobol_points, encoding=direct_encoding(), N=3000,
         N (int): number of points.
         noise (float): random noise added to point positions.
         domain (torch.tensor): integration domain [3,2] , pass None for [-1,1]^3. Currently Not Implemented!
+        out (torch.tensor, optional): tensor of shape (len(target_points),1) the result is written into, e.g. to reuse it
+                                      across training iterations. Defaults to None (a new tensor is allocated).
     """
     if domain is not None:
         raise NotImplementedError(
             "Custom domain is not yet implemented for U_ld.")
 
-    # init result vector
-    retval = torch.empty(len(target_points), 1,
-                         device=os.environ["TORCH_DEVICE"])
+    # init result vector (or use the one passed)
+    retval = out if out is not None else torch.empty(
+        len(target_points), 1, device=os.environ["TORCH_DEVICE"])
 
     if N > np.shape(sobol_points)[0]:
         print("Too many points queried, the Sobol points passed are less.")
     # We generate randomly points in the [-1,1]^3 bounds
-    if os.environ["TORCH_DEVICE"] != "cpu":
-        sample_points = torch.cuda.FloatTensor(
-            sobol_points[:N, :] * 2 - 1, device=os.environ["TORCH_DEVICE"]) + torch.rand(N, 3, device=os.environ["TORCH_DEVICE"]) * noise
-    else:
-        sample_points = torch.tensor(
-            sobol_points[:N, :] * 2 - 1) + torch.rand(N, 3) * noise
+    sample_points = _get_sobol_points(N, sobol_points) + torch.rand(
+        N, 3, device=os.environ["TORCH_DEVICE"]) * noise
 
     # Evaluate Rho on the grid
     rho = _compute_model_output(model, encoding, sample_points)
 
     # Compute the integral using the sampled and target points
-    for i, target_point in enumerate(target_points):
-        retval[i] = torch.sum(
-            rho/torch.norm(target_point - sample_points, dim=1).view(-1, 1)) / N
-    return - 8 * retval
+    # the mc integral in the hypercube [-1,1]^3 (volume is 8), its sign folded into the weights
+    _integrate_in_chunks(_potential_kernel_fused, target_points,
+                         sample_points, rho.view(-1) * (-8.0 / N), retval)
+    return retval
 
 # Trapezoid rule for the potential
 
 
-def U_trap_opt(target_points, model, encoding=direct_encoding(), N=10000, verbose=False, noise=0., sample_points=None, h=None, domain=None):
+def U_trap_opt(target_points, model, encoding=direct_encoding(), N=10000, verbose=False, noise=0., sample_points=None, h=None, domain=None, integrand_dtype=None, out=None):
     """Uses a 3D trapezoid rule for the evaluation of the integral in the potential from the modeled density
 
     Args:
@@ -147,6 +182,10 @@ def U_trap_opt(target_points, model, encoding=direct_encoding(), N=10000, verbos
         sample_points (torch tensor): grid to sample the integral on
         h (float): grid spacing, only has to be passed if grid is passed.
         domain (torch.tensor): integration domain [3,2] , pass None for [-1,1]^3. Currently Not Implemented!
+        integrand_dtype (torch.dtype, optional): dtype to evaluate the integrand in (e.g. torch.bfloat16), the sums
+                                                 are still accumulated in float32. Defaults to None (dtype of the grid).
+        out (torch.tensor, optional): tensor of shape (len(target_points),1) the result is written into, e.g. to reuse it
+                                      across training iterations. Defaults to None (a new tensor is allocated).
 
     Returns:
         Tensor: Computed potentials per point
@@ -155,9 +194,9 @@ def U_trap_opt(target_points, model, encoding=direct_encoding(), N=10000, verbos
         raise NotImplementedError(
             "Custom domain is not yet implemented for U_trap_opt.")
 
-    # init result vector
-    retval = torch.empty(len(target_points), 1,
-                         device=os.environ["TORCH_DEVICE"])
+    # init result vector (or use the one passed)
+    retval = out if out is not None else torch.empty(
+        len(target_points), 1, device=os.environ["TORCH_DEVICE"])
 
     # Determine grid to compute on
     if sample_points is None:
@@ -169,29 +208,16 @@ def U_trap_opt(target_points, model, encoding=direct_encoding(), N=10000, verbos
     # Evaluate Rho on the grid
     rho = _compute_model_output(model, encoding, sample_points)
 
-    for i, target_point in enumerate(target_points):
-
-        # Evaluate all points
-        f_values = rho/torch.norm(target_point -
-                                  sample_points, dim=1).view(-1, 1).detach()
-
-        evaluations = f_values.reshape([N, N, N])  # map to z,y,x
-
-        # area = h / 2 * (f0 + f2)
-        int_x = h[0] / 2 * (evaluations[:, :, 0:-1] + evaluations[:, :, 1:])
-        int_x = torch.sum(int_x, dim=2)
-        int_y = h[1] / 2 * (int_x[:, 0:-1] + int_x[:, 1:])
-        int_y = torch.sum(int_y, dim=1)
-        int_z = h[2] / 2 * (int_y[0:-1] + int_y[1:])
-        int_z = torch.sum(int_z, dim=0)
-
-        retval[i] = int_z
-    return -retval
+    # The trapezoid weights of each grid point (and the sign of the potential) are folded into rho
+    rho_w = rho.view(-1) * _trapezoid_weights(h, N, scale=-1.0)
+    _integrate_in_chunks(_potential_kernel_fused, target_points,
+                         sample_points, rho_w, retval, integrand_dtype)
+    return retval
 
 # Low-discrepancy Montecarlo for the acceleration
 
 
-def ACC_ld(target_points, model, encoding=direct_encoding(), N=3000, noise=0., domain=None):
+def ACC_ld(target_points, model, encoding=direct_encoding(), N=3000, noise=0., domain=None, out=None):
     """Low discrepancy Monte Carlo evaluation of the potential from the modelled density
 
     Args:
@@ -201,39 +227,32 @@ def ACC_ld(target_points, model, encoding=direct_encoding(), N=3000, noise=0., d
         N (int): number of points.
         noise (float): random noise added to point positions.
         domain (torch.tensor): integration domain [3,2] , pass None for [-1,1]^3. Currently Not Implemented!
+        out (torch.tensor, optional): tensor of shape (len(target_points),3) the result is written into, e.g. to reuse it
+                                      across training iterations. Defaults to None (a new tensor is allocated).
     """
     if domain is not None:
         raise NotImplementedError(
             "Custom domain is not yet implemented for ACC_ld.")
 
-    # init result vector
-    retval = torch.empty(len(target_points), 3,
-                         device=os.environ["TORCH_DEVICE"])
+    # init result vector (or use the one passed)
+    retval = out if out is not None else torch.empty(
+        len(target_points), 3, device=os.environ["TORCH_DEVICE"])
 
-    # We check that there are enough sobol points in the global variable
-    if N > np.shape(sobol_points)[0]:
-        raise ValueError(
-            "Too many points the sobol sequence stored in a global variable only contains 200000.")
     # We generate pseudo-randomly points in the [-1,1]^3 bounds, taking care to have them of the correct type
-    if os.environ["TORCH_DEVICE"] != "cpu":
-        sample_points = torch.cuda.FloatTensor(
-            sobol_points[:N, :] * 2 - 1, device=os.environ["TORCH_DEVICE"]) + torch.rand(N, 3, device=os.environ["TORCH_DEVICE"]) * noise
-    else:
-        sample_points = torch.tensor(
-            sobol_points[:N, :] * 2 - 1) + torch.rand(N, 3) * noise
+    sample_points = _get_sobol_points(N) + torch.rand(
+        N, 3, device=os.environ["TORCH_DEVICE"]) * noise
 
     # Evaluate Rho on the grid
     rho = _compute_model_output(model, encoding, sample_points)
 
-    # the mc integral in the hypercube [-1,1]^3 (volume is 8) for each of the target points
-    for i, target_point in enumerate(target_points):
-        dr = torch.sub(target_point, sample_points)
-        retval[i] = torch.sum(
-            rho/torch.pow(torch.norm(dr, dim=1), 3).view(-1, 1) * dr, dim=0) / N
-    return - 8 * retval
+    # the mc integral in the hypercube [-1,1]^3 (volume is 8) for each of the target points, its sign
+    # folded into the weights
+    _integrate_in_chunks(_acc_kernel_fused, target_points,
+                         sample_points, rho.view(-1) * (-8.0 / N), retval)
+    return retval
 
 
-def ACC_trap(target_points, model, encoding=direct_encoding(), N=10000, verbose=False, noise=0., sample_points=None, h=None, domain=None):
+def ACC_trap(target_points, model, encoding=direct_encoding(), N=10000, verbose=False, noise=0., sample_points=None, h=None, domain=None, integrand_dtype=None, out=None):
     """Uses a 3D trapezoid rule for the evaluation of the integral in the potential from the modeled density
 
     Args:
@@ -246,6 +265,10 @@ def ACC_trap(target_points, model, encoding=direct_encoding(), N=10000, verbose=
         sample_points (torch tensor): grid to sample the integral on
         h (float): grid spacing, only has to be passed if grid is passed.
         domain (torch.tensor): integration domain [3,2] , pass None for [-1,1]^3 
+        integrand_dtype (torch.dtype, optional): dtype to evaluate the integrand in (e.g. torch.bfloat16), the sums
+                                                 are still accumulated in float32. Defaults to None (dtype of the grid).
+        out (torch.tensor, optional): tensor of shape (len(target_points),3) the result is written into, e.g. to reuse it
+                                      across training iterations. Defaults to None (a new tensor is allocated).
 
     Returns:
         Tensor: Computed potentials per point
@@ -254,9 +277,9 @@ def ACC_trap(target_points, model, encoding=direct_encoding(), N=10000, verbose=
     if domain is None:  # None might be passed as well
         domain = [[-1, 1], [-1, 1], [-1, 1]]
 
-    # init result vector
-    retval = torch.empty(len(target_points), 3,
-                         device=os.environ["TORCH_DEVICE"])
+    # init result vector (or use the one passed)
+    retval = out if out is not None else torch.empty(
+        len(target_points), 3, device=os.environ["TORCH_DEVICE"])
 
     # Determine grid to compute on
     if sample_points is None:
@@ -268,30 +291,16 @@ def ACC_trap(target_points, model, encoding=direct_encoding(), N=10000, verbose=
     # Evaluate Rho on the grid
     rho = _compute_model_output(model, encoding, sample_points)
 
-    for i, target_point in enumerate(target_points):
-
-        # Evaluate all points
-        distance = torch.sub(target_point, sample_points)
-        f_values = (rho /
-                    torch.pow(torch.norm(distance, dim=1), 3).view(-1, 1) * distance)
-
-        evaluations = f_values.reshape([N, N, N, 3])  # map to z,y,x
-
-        # area = h / 2 * (f0 + f2)
-        int_x = h[0] / 2 * (evaluations[:, :, 0:-1, :] +
-                            evaluations[:, :, 1:, :])
-        int_x = torch.sum(int_x, dim=2)
-        int_y = h[1] / 2 * (int_x[:, 0:-1, :] + int_x[:, 1:, :])
-        int_y = torch.sum(int_y, dim=1)
-        int_z = h[2] / 2 * (int_y[0:-1, :] + int_y[1:, :])
-        int_z = torch.sum(int_z, dim=0)
-
-        retval[i] = int_z
-    return -retval
+    # The trapezoid weights of each grid point (and the sign of the acceleration) are folded into rho
+    rho_w = rho.view(-1) * _trapezoid_weights(h, N, scale=-1.0)
+    _integrate_in_chunks(_acc_kernel_fused, target_points,
+                         sample_points, rho_w, retval, integrand_dtype)
+    return retval
 
 
 def compute_integration_grid(N, noise=0.0, domain=[[-1, 1], [-1, 1], [-1, 1]]):
-    """Creates a grid which can be used for the trapezoid integration
+    """Creates a grid which can be used for the trapezoid integration. The noise-free grid is cached,
+    so the returned points must not be modified in place.
 
     Args:
         N (int): Number of points to approximately  generate
@@ -303,32 +312,225 @@ def compute_integration_grid(N, noise=0.0, domain=[[-1, 1], [-1, 1], [-1, 1]]):
     """
     N = int(np.round(np.cbrt(N)))  # approximate subdivisions
 
-    h = torch.zeros([3], device=os.environ["TORCH_DEVICE"])
-    # Create grid and assemble evaluation points
-
-    grid_1d_x = torch.linspace(
-        domain[0][0], domain[0][1], N, device=os.environ["TORCH_DEVICE"])
-    grid_1d_y = torch.linspace(
-        domain[1][0], domain[1][1], N, device=os.environ["TORCH_DEVICE"])
-    grid_1d_z = torch.linspace(
-        domain[2][0], domain[2][1], N, device=os.environ["TORCH_DEVICE"])
-
-    h[0] = (grid_1d_x[1] - grid_1d_x[0])
-    h[1] = (grid_1d_y[1] - grid_1d_y[0])
-    h[2] = (grid_1d_z[1] - grid_1d_z[0])
-
-    x, y, z = torch.meshgrid(grid_1d_x, grid_1d_y, grid_1d_z)
-    eval_points = torch.stack((x.flatten(), y.flatten(), z.flatten())).transpose(
-        0, 1).to(os.environ["TORCH_DEVICE"])
+    # The domain is converted to nested tuples so that it can be used as cache key
+    domain = tuple(tuple(float(bound) for bound in axis) for axis in domain)
+    eval_points, h = _get_integration_grid(
+        N, domain, os.environ["TORCH_DEVICE"], torch.get_default_dtype())
 
     # We add some noise to the evaluated grid points to ensure the networks learns all
     if noise > 0:
-        eval_points += torch.rand(N**3, 3,
-                                  device=os.environ["TORCH_DEVICE"]) * noise
+        eval_points = eval_points + torch.rand(N**3, 3,
+                                               device=os.environ["TORCH_DEVICE"]) * noise
 
     return eval_points, h, N
 
 
+@functools.lru_cache(maxsize=4)
+def _get_integration_grid(N, domain, device, dtype):
+    """Creates the (noise-free) grid for the trapezoid integration. Results are cached as the grid
+    only depends on the arguments and is otherwise rebuilt at every training iteration.
+
+    Args:
+        N (int): Number of grid points per axis
+        domain (tuple): integration domain ((x_min, x_max), (y_min, y_max), (z_min, z_max))
+        device (str): torch device to create the grid on
+        dtype (torch.dtype): dtype of the grid (i.e. the torch default dtype)
+
+    Returns:
+        torch tensor, torch tensor: sample points, grid h
+    """
+    # The grid is cached process wide, so it must not be an inference tensor even if first requested in an
+    # inference mode context (e.g. by a plot), or it could not be saved for backward by a later training step
+    with torch.inference_mode(False):
+        h = torch.zeros([3], device=device, dtype=dtype)
+        # Create grid and assemble evaluation points
+
+        grid_1d_x = torch.linspace(
+            domain[0][0], domain[0][1], N, device=device, dtype=dtype)
+        grid_1d_y = torch.linspace(
+            domain[1][0], domain[1][1], N, device=device, dtype=dtype)
+        grid_1d_z = torch.linspace(
+            domain[2][0], domain[2][1], N, device=device, dtype=dtype)
+
+        h[0] = (grid_1d_x[1] - grid_1d_x[0])
+        h[1] = (grid_1d_y[1] - grid_1d_y[0])
+        h[2] = (grid_1d_z[1] - grid_1d_z[0])
+
+        x, y, z = torch.meshgrid(grid_1d_x, grid_1d_y, grid_1d_z, indexing="ij")
+        eval_points = torch.stack((x.flatten(), y.flatten(), z.flatten())).transpose(
+            0, 1).to(device)
+
+    _integration_grids[id(eval_points)] = eval_points
+    return eval_points, h
+
+
+def _get_sobol_points(N, sobol_points=None):
+    """Returns the first N Sobol points mapped to [-1,1]^3 as a tensor on the current torch device.
+    Conversions are cached so that the same points are not uploaded again at every call.
+
+    Args:
+        N (int): Number of points.
+        sobol_points (array Mx3, optional): Sobol points in [0,1]^3. Defaults to None, in which case
+                                            the global sequence is used.
+
+    Returns:
+        torch tensor: the (N,3) points
+    """
+    device = os.environ["TORCH_DEVICE"]
+    key = (None if sobol_points is None else id(sobol_points), device)
+    source, points = _sobol_cache.get(key, (None, None))
+
+    # The source is stored alongside to detect if its id was reused by another array
+    if points is None or source is not sobol_points or (sobol_points is None and len(points) < N):
+        # The cached points must not be inference tensors (see _get_integration_grid)
+        with torch.inference_mode(False):
+            if sobol_points is None:
+                points = _get_global_sobol_points(N)
+            else:
+                points = torch.as_tensor(
+                    np.asarray(sobol_points), dtype=torch.get_default_dtype()) * 2 - 1
+            points = points.to(device, non_blocking=True)
+        _sobol_cache[key] = (sobol_points, points)
+    return points[:N]
+
+
+def _get_global_sobol_points(N):
+    """Returns the global Sobol sequence mapped to [-1,1]^3 as a CPU tensor, pinned if CUDA is available
+    to speed up the upload to the GPU. The sequence is (re)generated if it has less than N points.
+
+    Args:
+        N (int): Minimal number of points.
+
+    Returns:
+        torch tensor: the (max(N, _SOBOL_POINTS_NUMBER),3) points
+    """
+    global _sobol_points
+    if _sobol_points is None or len(_sobol_points) < N:
+        _sobol_points = _draw_sobol_points(
+            3, max(N, _SOBOL_POINTS_NUMBER), torch.get_default_dtype()) * 2 - 1
+        if torch.cuda.is_available():
+            _sobol_points = _sobol_points.pin_memory()
+    return _sobol_points
+
+
+def _integrate_in_chunks(kernel, target_points, sample_points, rho_w, retval, integrand_dtype=None):
+    """Evaluates the integral of the passed kernel times the density for all target points. Targets are
+    processed in chunks to bound the memory of the (chunk, M, 3) intermediates.
+
+    Args:
+        kernel (func): one of the fused kernels (e.g. _acc_kernel_fused)
+        target_points (torch tensor): (B,3) target points
+        sample_points (torch tensor): (M,3) sample points
+        rho_w (torch tensor): (M,) density at the sample points times their quadrature weight
+        retval (torch tensor): (B,C) tensor the results are written into
+        integrand_dtype (torch.dtype, optional): dtype to evaluate the integrand in. The sums are always
+                                                 accumulated in float32. Defaults to None.
+
+    Returns:
+        torch tensor: retval
+    """
+    if integrand_dtype is not None:
+        sample_points = sample_points.to(integrand_dtype)
+        rho_w = rho_w.to(integrand_dtype)
+
+    chunk_size = _get_target_chunk_size(sample_points)
+
+    # The kernels read the sample points as (3,M), so that each coordinate is contiguous in memory
+    sample_points = sample_points.t().contiguous()
+
+    for start in range(0, len(target_points), chunk_size):
+        target_chunk = target_points[start:start +
+                                     chunk_size].to(sample_points.dtype)
+
+        # Only the density requires a gradient, so the kernel is kept out of the autograd graph
+        with torch.no_grad():
+            kernel_values = kernel(target_chunk, sample_points)
+        # The weighted sum is reduced in float32 whatever the integrand dtype. It is written as a product and
+        # a sum (rather than a contraction, which runs as a matmul) so that it is not eligible for TF32 either
+        retval[start:start + len(target_chunk)] = (kernel_values * rho_w).sum(
+            -1, dtype=torch.float32).t()
+    return retval
+
+
+def _get_target_chunk_size(sample_points):
+    """Determines how many target points can be integrated at once, from the free GPU memory if available.
+
+    Args:
+        sample_points (torch tensor): (M,3) sample points
+
+    Returns:
+        int: number of targets per chunk
+    """
+    if sample_points.device.type != "cuda" or not hasattr(torch.cuda, "mem_get_info"):
+        return _TARGET_CHUNK_SIZE
+    free_memory, _ = torch.cuda.mem_get_info(sample_points.device)
+    bytes_per_target = _INTERMEDIATES_PER_TARGET * \
+        len(sample_points) * sample_points.element_size()
+    return max(1, int(_TARGET_CHUNK_MEMORY_FRACTION * free_memory / bytes_per_target))
+
+
+def _acc_kernel(target_points, sample_points):
+    """Computes the kernel of the acceleration integral, (t - s) / |t - s|^3, for a batch of target points.
+
+    Args:
+        target_points (torch tensor): (B,3) target points
+        sample_points (torch tensor): (3,M) sample points, one contiguous row per coordinate
+
+    Returns:
+        torch tensor: (3,B,M) kernel values
+    """
+    dx = target_points[:, 0:1] - sample_points[0]
+    dy = target_points[:, 1:2] - sample_points[1]
+    dz = target_points[:, 2:3] - sample_points[2]
+    r2 = dx * dx + dy * dy + dz * dz
+    inv_r3 = r2.rsqrt() / r2  # rsqrt(r2)/r2 == r^-3
+    return torch.stack((dx * inv_r3, dy * inv_r3, dz * inv_r3))
+
+
+def _potential_kernel(target_points, sample_points):
+    """Computes the kernel of the potential integral, 1 / |t - s|, for a batch of target points.
+
+    Args:
+        target_points (torch tensor): (B,3) target points
+        sample_points (torch tensor): (3,M) sample points, one contiguous row per coordinate
+
+    Returns:
+        torch tensor: (1,B,M) kernel values
+    """
+    dx = target_points[:, 0:1] - sample_points[0]
+    dy = target_points[:, 1:2] - sample_points[1]
+    dz = target_points[:, 2:3] - sample_points[2]
+    return (dx * dx + dy * dy + dz * dz).rsqrt().unsqueeze(0)
+
+
+# The kernels are compiled (or scripted on older torch versions) so that the pointwise ops are fused
+if hasattr(torch, "compile"):
+    _acc_kernel_fused = torch.compile(_acc_kernel)
+    _potential_kernel_fused = torch.compile(_potential_kernel)
+else:
+    _acc_kernel_fused = torch.jit.script(_acc_kernel)
+    _potential_kernel_fused = torch.jit.script(_potential_kernel)
+
+
+def _trapezoid_weights(h, N, scale=1.0):
+    """Computes the weights of the trapezoid rule for each point of the integration grid, i.e. the
+    product of the 1D weights along each axis (h / 2 at the two end points and h in the interior).
+
+    Args:
+        h (torch tensor): grid spacing along each axis
+        N (int): number of grid points per axis
+        scale (float, optional): constant factor folded into the weights (e.g. -1 for the potential). Defaults to 1.
+
+    Returns:
+        torch tensor: the (N**3,) weights, ordered as the grid points ("ij" indexing)
+    """
+    weights = h.view(3, 1).repeat(1, N)
+    weights[:, 0] /= 2
+    weights[:, -1] /= 2
+    weights[0] *= scale
+    return torch.einsum('x,y,z->xyz', weights[0], weights[1], weights[2]).reshape(-1)
+
+
 def _check_model_encoding_compatibility(model, encoding):
     """ We check that the model is compatible with the encoding in terms of number of inputs
 
@@ -359,12 +561,74 @@ def _compute_model_output(model, encoding, sample_points):
     _check_model_encoding_compatibility(model, encoding)
 
     # 1 - compute the inputs to the ANN encoding the sampled points
-    nn_inputs = encoding(sample_points)
-
-    # 2 - check if any values were NaN
-    if torch.any(nn_inputs != nn_inputs):
-        warnings.warn("The network generated NaN outputs!")
-        nn_inputs[nn_inputs != nn_inputs] = 0.0  # set Nans to 0
+    nn_inputs = _get_encoded_inputs(encoding, sample_points)
 
-    # 3 - compute the predicted density at the points
+    # 2 - compute the predicted density at the points
     return model(nn_inputs)
+
+
+def _get_encoded_inputs(encoding, sample_points):
+    """Encodes the sample points as network inputs. The fixed integration grid is passed at every
+    training iteration, so the encoded inputs of the last few (grid, encoding) pairs are cached. Only
+    the noise-free grids of _get_integration_grid are cached (other sample points, e.g. noisy ones, are
+    rebuilt at every call) and an entry is only reused if the grid was not modified in place since. The
+    direct encoding is not cached.
+
+    Args:
+        encoding (encoding): encoding for network input
+        sample_points (torch tensor): points to sample at
+
+    Returns:
+        torch tensor: the network inputs
+    """
+    cacheable = (_integration_grids.get(id(sample_points)) is sample_points
+                 and not isinstance(encoding, direct_encoding)
+                 and not sample_points.requires_grad)
+    key = (id(sample_points), id(encoding))
+    # The references are kept alongside, so the ids cannot have been reused
+    if cacheable and key in _encoded_cache and _encoded_cache[key][1] == sample_points._version:
+        _encoded_cache.move_to_end(key)
+        return _encoded_cache[key][3]
+
+    # Cached inputs are reused across the process, so they must not be inference tensors even if first requested
+    # in an inference mode context (e.g. by a plot), or a later training step could not save them for backward
+    with torch.inference_mode(False) if cacheable else contextlib.nullcontext():
+        nn_inputs = encoding(sample_points)
+
+        # check if any values were NaN (the check needs a device sync, so only in debug mode)
+        if os.environ.get("GRAVANN_DEBUG", "0") not in ("", "0") and torch.any(torch.isnan(nn_inputs)):
+            warnings.warn("The network generated NaN outputs!")
+        # set Nans to 0
+        nn_inputs = torch.nan_to_num(
+            nn_inputs, nan=0.0, posinf=float("inf"), neginf=float("-inf"))
+
+    if cacheable:
+        _encoded_cache[key] = (sample_points, sample_points._version, encoding, nn_inputs)
+        _encoded_cache.move_to_end(key)
+        if len(_encoded_cache) > _ENCODED_CACHE_SIZE:
+            _encoded_cache.popitem(last=False)
+    return nn_inputs
+
+
+def _get_compiled_model(model):
+    """Returns the compiled forward pass of the model, compiling it on first use. Only meant for the training
+    loop: the number of sample points is fixed there, so CUDA graphs can be captured (mode "reduce-overhead"),
+    while any other shape would trigger a new compilation. Falls back to the model itself where torch.compile
+    is unavailable or on CPU.
+
+    Args:
+        model (callable): neural network to eval
+
+    Returns:
+        callable: the compiled model (it forwards attribute lookups, e.g. in_features, to the model)
+    """
+    if not (hasattr(torch, "compile") and isinstance(model, torch.nn.Module)
+            and os.environ["TORCH_DEVICE"] != "cpu"):
+        return model
+    compiled = model.__dict__.get("_compiled_forward")
+    if compiled is None:
+        compiled = torch.compile(model, mode="reduce-overhead", dynamic=False)
+        # Stored in the instance dict, so it is not registered as a submodule (the state dict is unchanged).
+        # The resulting reference cycle is collected together with the model
+        model.__dict__["_compiled_forward"] = compiled
+    return compiled
@@ -3,47 +3,39 @@ import torch
 import os
 
 import pyvista as pv
+from scipy.spatial import cKDTree
 
 # This function computes the distance of some points `target_points`to the `cloud_points` per target point as
 # min(distance(target_point,cloud_points))
 
 
-def _point_cloud_distance(target_points, cloud_points):
-    """ This function computes the distance of some points `target_points`to the `cloud_points` per target point as min(distance(target_point,cloud_points)) 
+def _point_cloud_distance(target_points, cloud_tree):
+    """ This function computes the distance of some points `target_points`to the cloud points per target point as min(distance(target_point,cloud_points)) 
 
     Args:
         target_points (numpy arr): Points to compute distance for
-        cloud_points (numpy arr): Point cloud
+        cloud_tree (scipy.spatial.cKDTree): KD-tree of the point cloud
 
     Returns:
         np array: Per point minimal distance to cloud points
     """
-    distances = np.zeros(len(target_points))
-    # per point compute distance to the cloud
-    for i, point in enumerate(target_points):
-        distances[i] = np.min(np.linalg.norm(point-cloud_points, axis=1))
+    distances, _ = cloud_tree.query(target_points, k=1)
     return distances
 
 
-def _point_cloud_topk_distance(target_points, cloud_points, k=5):
-    """ This function computes the distance of some points `target_points`to the `cloud_points` per target point as mean distance of k closest cloud points
+def _point_cloud_topk_distance(target_points, cloud_tree, k=5):
+    """ This function computes the distance of some points `target_points`to the cloud points per target point as mean distance of k closest cloud points
 
     Args:
         target_points (numpy arr): Points to compute distance for
-        cloud_points (numpy arr): Point cloud
+        cloud_tree (scipy.spatial.cKDTree): KD-tree of the point cloud
         k (int): number of neighbors to consider
 
     Returns:
         np array: Per point mean distance to 5 closest cloud points
     """
-    distances = np.zeros(len(target_points))
-    # per point compute distance to the cloud
-    for i, point in enumerate(target_points):
-        dist = np.linalg.norm(point-cloud_points, axis=1)
-        # get 5 smallest elements and sum them
-        idx = np.argpartition(dist, k)
-        distances[i] = np.sum(dist[idx[:k]]) / k
-    return distances
+    distances, _ = cloud_tree.query(target_points, k=k)
+    return np.mean(distances, axis=1)
 
 
 def create_mesh_from_cloud(cloud_points, cube_scale=1, subdivisions=6, stepsize=0.005,
@@ -75,9 +67,11 @@ def create_mesh_from_cloud(cloud_points, cube_scale=1, subdivisions=6, stepsize=
 
     # Initialize per vertex normalized target direction (in which direction the vertex will travel)
     target_direction = target_point - cube.points
-    for i in range(N):
-        target_direction[i] = target_direction[i] / \
-            np.linalg.norm(target_direction[i])
+    target_direction /= np.linalg.norm(target_direction,
+                                       axis=1).reshape(-1, 1)
+
+    # KD-tree of the cloud, used for all the distance queries
+    cloud_tree = cKDTree(cloud_points)
 
     # If adaptive stepsize, start each vertex with default stepsize
     if adaptive_step:
@@ -109,9 +103,9 @@ def create_mesh_from_cloud(cloud_points, cube_scale=1, subdivisions=6, stepsize=
         # Compute values at new positions
         if use_top_k > 1:
             cloud_distances = _point_cloud_topk_distance(
-                new_points, cloud_points, use_top_k)
+                new_points, cloud_tree, use_top_k)
         else:
-            cloud_distances = _point_cloud_distance(new_points, cloud_points)
+            cloud_distances = _point_cloud_distance(new_points, cloud_tree)
         if verbose:
             print("cloud_distances", cloud_distances)
 
@@ -181,6 +175,13 @@ def create_mesh_from_model(model, encoding, cube_scale=1.5, subdivisions=6,  # m
     point_to_compute = np.asarray([True] * N)
     it = 0
 
+    # Page-locked host buffer the vertices are copied to the device from at each iteration
+    device = os.environ["TORCH_DEVICE"]
+    pin = device != "cpu"
+    # (explicitly on the CPU, as enableCUDA makes CUDA tensors the default)
+    points_buffer = torch.empty(
+        N, 3, dtype=torch.float, device="cpu", pin_memory=pin)
+
     while any(point_to_compute) and it < max_iter:
         if it % plot_each_it == 0 and plot_each_it > 0:
             print(
@@ -197,11 +198,12 @@ def create_mesh_from_model(model, encoding, cube_scale=1.5, subdivisions=6,  # m
         if verbose:
             print("new_points", new_points)
 
-        # Compute values at new positions
-        new_points = torch.tensor(
-            new_points, dtype=torch.float, device=os.environ["TORCH_DEVICE"])
-        nn_inputs = encoding(new_points)
-        rho = model(nn_inputs).squeeze().detach().cpu().numpy()
+        # Compute values at new positions (the buffer can be reused as the next iteration waits for rho)
+        n_points = len(new_points)
+        points_buffer[:n_points] = torch.from_numpy(new_points)
+        nn_inputs = encoding(points_buffer[:n_points].to(
+            device, non_blocking=pin))
+        rho = model(nn_inputs).reshape(-1).detach().cpu().numpy()
         if verbose:
             print("rho", rho)
 
@@ -211,7 +213,7 @@ def create_mesh_from_model(model, encoding, cube_scale=1.5, subdivisions=6,  # m
             print("point_to_compute", point_to_compute)
 
         # Where value smaller than threshold change vertex to this position
-        cube.points[point_to_compute] = new_points[rho < rho_threshold].cpu()
+        cube.points[point_to_compute] = new_points[rho < rho_threshold]
         if verbose:
             print("cube.points", cube.points)
 
@@ -223,3 +225,19 @@ def create_mesh_from_model(model, encoding, cube_scale=1.5, subdivisions=6,  # m
         it += 1
 
     return cube
+
+
+def create_mesh_from_model_no_plot(model, encoding, rho_threshold=1.5e-2, **kwargs):
+    """Generates a mesh from a model without any intermediate plot or output (see create_mesh_from_model)
+
+    Args:
+        model (Torch Model): Model to use
+        encoding (Encoding function): The function used to encode points for the model
+        rho_threshold (float): rho cutoff where points are considered to be inside. Defaults to 1.5e-2
+        kwargs: further arguments of create_mesh_from_model (except plot_each_it and verbose)
+
+    Returns:
+        [pyvista mesh]: Mesh of the model
+    """
+    return create_mesh_from_model(model, encoding, rho_threshold=rho_threshold, verbose=False,
+                                  plot_each_it=-1, **kwargs)
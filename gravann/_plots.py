@@ -4,7 +4,7 @@
 
 
 from  gravann._sample_observation_points import get_target_point_sampler
-from  gravann._mesh_conversion import create_mesh_from_cloud, create_mesh_from_model
+from  gravann._mesh_conversion import create_mesh_from_cloud, create_mesh_from_model_no_plot
 from  gravann._integration import ACC_trap, U_trap_opt
 from  gravann._mascon_labels import ACC_L
 from  gravann._hulls import is_outside_torch, is_outside
@@ -13,6 +13,7 @@ from  gravann._utils import unpack_triangle_mesh
 from matplotlib import pyplot as plt
 import matplotlib as mpl
 from matplotlib.lines import Line2D
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 import matplotlib.colors as colors
 import torch
 import math
@@ -20,10 +21,61 @@ import numpy as np
 import pickle as pk
 import pyvista as pv
 import pyvistaqt as pvqt
+import functools
+import weakref
+from contextlib import contextmanager
 from tqdm import tqdm
 from scipy.spatial.transform import Rotation as rotation
 pv.set_plot_theme("default")
 
+# Maximum number of candidates evaluated at once by the rejection sampling of the model plots
+_MAX_REJECTION_BATCH_SIZE = 65536
+
+# Last mesh generated from each model, together with the state of the model it was generated for
+_mesh_cache = weakref.WeakKeyDictionary()
+
+
+@contextmanager
+def _inference(model):
+    """Context to evaluate a model only for plotting: no autograd graph is built (inference mode, which also
+    skips the version counter and view tracking, where available) and the model is put in eval mode, its
+    previous mode being restored on exit. Tensors created in the context cannot be modified in place after it.
+
+    Args:
+        model (torch model): the model to evaluate
+    """
+    was_training = model.training
+    model.eval()
+    no_autograd = torch.inference_mode if hasattr(
+        torch, "inference_mode") else torch.no_grad
+    try:
+        with no_autograd():
+            yield
+    finally:
+        model.train(was_training)
+
+
+def _get_model_mesh(model, encoding, rho_threshold=1.5e-2):
+    """Generates the mesh from a model, reusing the last one generated for it as long as the model parameters,
+    the encoding and the threshold are unchanged (any in-place update of the parameters, e.g. an optimizer
+    step, bumps their version counters).
+
+    Args:
+        model (Torch Model): Model to use
+        encoding (Encoding function): The function used to encode points for the model
+        rho_threshold (float, optional): rho cutoff where points are considered to be inside. Defaults to 1.5e-2.
+
+    Returns:
+        pyvista mesh: a copy of the (cached) mesh
+    """
+    key = (encoding.name, rho_threshold,
+           tuple((p.data_ptr(), p._version) for p in model.parameters()))
+    if model not in _mesh_cache or _mesh_cache[model][0] != key:
+        mesh = create_mesh_from_model_no_plot(
+            model, encoding, rho_threshold=rho_threshold)
+        _mesh_cache[model] = (key, mesh)
+    return _mesh_cache[model][1].copy()
+
 
 def plot_model_vs_cloud_mesh(model, gt_mesh, encoding, save_path=None):
     """Creates a side by side of the model and the ground truth mesh passed to this
@@ -34,8 +86,7 @@ def plot_model_vs_cloud_mesh(model, gt_mesh, encoding, save_path=None):
         encoding (func): encoding function for the model
         save_path (str, optional): Pass to store plot, if none will display. Defaults to None.
     """
-    model_mesh = create_mesh_from_model(
-        model, encoding, rho_threshold=1.5e-2, plot_each_it=-1)
+    model_mesh = _get_model_mesh(model, encoding, rho_threshold=1.5e-2)
 
     p = pv.Plotter(shape=(1, 2))
 
@@ -86,8 +137,7 @@ def plot_model_mesh(model, encoding, interactive=False, rho_threshold=1.5e-2):
         encoding (Encoding function): The function used to encode points for the model
         interactive (bool, optional): Creates a separate window which you can use interactively. Defaults to True.
     """
-    mesh = create_mesh_from_model(
-        model, encoding, rho_threshold=rho_threshold, plot_each_it=-1)
+    mesh = _get_model_mesh(model, encoding, rho_threshold=rho_threshold)
     plot_mesh(mesh, smooth_shading=True,
               show_edges=False, interactive=interactive)
     return mesh
@@ -133,6 +183,23 @@ def plot_mesh(mesh, show_edges=True, smooth_shading=False, interactive=True, ele
     p.show()
 
 
+def _plot_section_planes(ax, D=1., offset=0.):
+    """Draws the X (red), Y (blue) and Z (green) section planes of the [-D,D]**3 cube as dashed rectangles,
+    all their edges being added as a single collection per plane
+
+    Args:
+        ax (matplotlib axes): the 3D axes to draw on
+        D (float, optional): half size of the cube. Defaults to 1.
+        offset (float, optional): an offset to apply to the planes in the direction of their normal. Defaults to 0.
+    """
+    square = np.array([[-D, -D], [-D, D], [D, D], [D, -D]])
+    for axis, color in enumerate(("red", "blue", "green")):
+        corners = np.insert(square, axis, offset, axis=1)
+        segments = np.stack((corners, np.roll(corners, -1, axis=0)), axis=1)
+        ax.add_collection3d(Line3DCollection(
+            segments, colors=color, linestyles="--", alpha=0.75))
+
+
 def plot_mascon(mascon_points, mascon_masses=None, elev=45, azim=45, alpha=0.01, s=None, views_2d=True, save_path=None):
     """Plots a mascon model
 
@@ -145,14 +212,11 @@ def plot_mascon(mascon_points, mascon_masses=None, elev=45, azim=45, alpha=0.01,
         s (int): scale for the visualized masses
 
     """
+    # A single copy of the points to the host
     if torch.is_tensor(mascon_points):
-        x = mascon_points[:, 0].cpu().numpy()
-        y = mascon_points[:, 1].cpu().numpy()
-        z = mascon_points[:, 2].cpu().numpy()
+        x, y, z = mascon_points.detach().float().cpu().numpy().T
     else:
-        x = np.array(mascon_points[:, 0])
-        y = np.array(mascon_points[:, 1])
-        z = np.array(mascon_points[:, 2])
+        x, y, z = np.asarray(mascon_points).T
 
     if s is None:
         if mascon_masses is None:
@@ -160,9 +224,9 @@ def plot_mascon(mascon_points, mascon_masses=None, elev=45, azim=45, alpha=0.01,
             s = s/max(s)*200
         else:
             if torch.is_tensor(mascon_masses):
-                s = mascon_masses.cpu().numpy() / sum(mascon_masses.cpu().numpy())
+                s = (mascon_masses / mascon_masses.sum()).detach().cpu().numpy()
             else:
-                s = np.array(mascon_masses) / sum(np.array(mascon_masses))
+                s = np.array(mascon_masses) / np.sum(mascon_masses)
             s = s/max(s)*200
 
     # And we plot it
@@ -180,15 +244,7 @@ def plot_mascon(mascon_points, mascon_masses=None, elev=45, azim=45, alpha=0.01,
     ax.set_ylim([-D, D])
     ax.set_zlim([-D, D])
     ax.set_axis_off()
-    # X Rectangle
-    ax.plot_wireframe(np.asarray([[0, 0], [0, 0]]), np.asarray([[D, D], [-D, -D]]),
-                      np.asarray([[-D, D], [-D, D]]), color="red", linestyle="--", alpha=0.75)
-    # Y Rectangle
-    ax.plot_wireframe(np.asarray([[D, D], [-D, -D]]), np.asarray([[0, 0], [0, 0]]),
-                      np.asarray([[-D, D], [-D, D]]), color="blue", linestyle="--", alpha=0.75)
-    # Z Rectangle
-    ax.plot_wireframe(np.asarray([[-D, D], [-D, D]]), np.asarray([[D, D], [-D, -D]]),
-                      np.asarray([[0, 0], [0, 0]]), color="green", linestyle="--", alpha=0.75)
+    _plot_section_planes(ax, D)
 
     if views_2d:
         ax2 = fig.add_subplot(222)
@@ -231,6 +287,22 @@ def plot_mascon(mascon_points, mascon_masses=None, elev=45, azim=45, alpha=0.01,
         plt.savefig(save_path, dpi=300)
 
 
+def _density_colors(rho, cmap="viridis"):
+    """Maps densities to RGBA colors once, so that matplotlib does not have to remap them at each draw
+    (same normalization as scatter, i.e. from the min to the max density)
+
+    Args:
+        rho (np.array): the densities
+        cmap (str, optional): name of the matplotlib colormap. Defaults to "viridis".
+
+    Returns:
+        np.array: (N,4) RGBA colors
+    """
+    rho = np.asarray(rho).reshape(-1)
+    rho_min, rho_max = rho.min(), rho.max()
+    return plt.get_cmap(cmap)((rho - rho_min) / (rho_max - rho_min + 1e-9))
+
+
 def plot_model_grid(model, encoding, N=20, bw=False, alpha=0.2, views_2d=True, c=1.):
     """Plots the neural model of the asteroid density in the [-1,1]**3 cube showing
     the density value on a grid.
@@ -246,17 +318,17 @@ def plot_model_grid(model, encoding, N=20, bw=False, alpha=0.2, views_2d=True, c
 
     """
 
-    # We create the grid
-    x = torch.linspace(-1, 1, N)
-    y = torch.linspace(-1, 1, N)
-    z = torch.linspace(-1, 1, N)
-    X, Y, Z = torch.meshgrid((x, y, z))
+    # We create the grid (in NumPy, as it is reused by all the plots)
+    grid_1d = np.linspace(-1, 1, N)
+    X, Y, Z = np.meshgrid(grid_1d, grid_1d, grid_1d, indexing="ij")
+    X, Y, Z = X.reshape(-1), Y.reshape(-1), Z.reshape(-1)
 
     # We compute the density on the grid points (no gradient as its only for plotting)
-    nn_inputs = torch.cat(
-        (X.reshape(-1, 1), Y.reshape(-1, 1), Z.reshape(-1, 1)), dim=1)
-    nn_inputs = encoding(nn_inputs)
-    RHO = model(nn_inputs).detach()*c
+    device = next(model.parameters()).device
+    nn_inputs = torch.tensor(np.stack((X, Y, Z), axis=1),
+                             dtype=torch.get_default_dtype(), device=device)
+    with _inference(model):
+        RHO = (model(encoding(nn_inputs)).float() * c).cpu().numpy()
 
     # And we plot it
     fig = plt.figure()
@@ -265,13 +337,14 @@ def plot_model_grid(model, encoding, N=20, bw=False, alpha=0.2, views_2d=True, c
     else:
         ax = fig.add_subplot(111, projection='3d')
     if bw:
-        col = torch.cat((1-RHO, 1-RHO, 1-RHO, RHO), dim=1).cpu()
+        col = np.clip(np.concatenate((1-RHO, 1-RHO, 1-RHO, RHO), axis=1), 0, 1)
         alpha = None
     else:
-        col = RHO.cpu()
+        col = _density_colors(RHO)
 
-    ax.scatter(X.reshape(-1, 1).cpu(), Y.reshape(-1, 1).cpu(), Z.reshape(-1, 1).cpu(),
-               marker='.', c=col, s=100, alpha=alpha)
+    # The colors encode the density, so they are not depth shaded (which would also remap them at each draw)
+    ax.scatter(X, Y, Z,
+               marker='.', c=col, s=100, alpha=alpha, depthshade=False)
     ax.set_xlim([-1, 1])
     ax.set_ylim([-1, 1])
     ax.set_zlim([-1, 1])
@@ -282,7 +355,7 @@ def plot_model_grid(model, encoding, N=20, bw=False, alpha=0.2, views_2d=True, c
 
     if views_2d:
         ax2 = fig.add_subplot(222)
-        ax2.scatter(X.reshape(-1, 1)[:, 0].cpu(), Y.reshape(-1, 1)[:, 0].cpu(),
+        ax2.scatter(X, Y,
                     marker='.', c=col, s=100, alpha=alpha)
         ax2.set_xlim([-1, 1])
         ax2.set_ylim([-1, 1])
@@ -291,7 +364,7 @@ def plot_model_grid(model, encoding, N=20, bw=False, alpha=0.2, views_2d=True, c
         ax2.set_aspect('equal', 'box')
 
         ax3 = fig.add_subplot(223)
-        ax3.scatter(X.reshape(-1, 1)[:, 0].cpu(), Z.reshape(-1, 1)[:, 0].cpu(),
+        ax3.scatter(X, Z,
                     marker='.', c=col, s=100, alpha=alpha)
         ax3.set_xlim([-1, 1])
         ax3.set_ylim([-1, 1])
@@ -300,7 +373,7 @@ def plot_model_grid(model, encoding, N=20, bw=False, alpha=0.2, views_2d=True, c
         ax3.set_aspect('equal', 'box')
 
         ax4 = fig.add_subplot(224)
-        ax4.scatter(Z.reshape(-1, 1)[:, 0].cpu(), Y.reshape(-1, 1)[:, 0].cpu(),
+        ax4.scatter(Z, Y,
                     marker='.', c=col, s=100, alpha=alpha)
         ax4.set_xlim([-1, 1])
         ax4.set_ylim([-1, 1])
@@ -330,33 +403,12 @@ def plot_model_rejection(model, encoding, N=1500, views_2d=False, bw=False, alph
         color (str): color to be used in the bw plot. Defaults to 'k'
         figure (matplotlib.figure): plots on an already created figure with the correct axis number and type. Defaults to None
     """
-    torch.manual_seed(42)  # Seed torch to always get the same points
-    points = []
-    rho = []
-    batch_size = 4096
-    found = 0
-    if progressbar:
-        pbar = tqdm(desc="Sampling points...", total=N)
-    while found < N:
-        candidates = torch.rand(batch_size, 3) * 2 - 1
-        nn_inputs = encoding(candidates)
-        rho_candidates = model(nn_inputs).detach() * c
-        mask = rho_candidates > (torch.rand(batch_size, 1) + crop_p)
-        rho_candidates = rho_candidates[mask]
-        candidates = [[it[0].item(), it[1].item(), it[2].item()]
-                      for it, m in zip(candidates, mask) if m]
-        if len(candidates) == 0:
-            print("All points rejected! Plot is empty, try cropping less?")
-            return
-        points.append(torch.tensor(candidates))
-        rho.append(rho_candidates)
-        found += len(rho_candidates)
-        if progressbar:
-            pbar.update(len(rho_candidates))
-    if progressbar:
-        pbar.close()
-    points = torch.cat(points, dim=0)[:N]  # concat and discard after N
-    rho = torch.cat(rho, dim=0)[:N]  # concat and discard after N
+    points, rho = _sample_model_rejection(
+        model, encoding, N, c, crop_p, progressbar)
+    if points is None:
+        return
+    # A single (float32) copy of the samples to the host, all plots use the NumPy arrays
+    points, rho = points.float().cpu().numpy(), rho.float().cpu().numpy()
 
     if figure is None:
         fig = plt.figure(figsize=(6, 5), dpi=100, facecolor='white')
@@ -370,32 +422,24 @@ def plot_model_rejection(model, encoding, N=1500, views_2d=False, bw=False, alph
     if bw:
         col = color
     else:
-        col = rho.cpu()
-    # And we plot it
-    ax.scatter(points[:, 0].cpu(), points[:, 1].cpu(), points[:, 2].cpu(),
-               marker='.', c=col, s=s, alpha=alpha)
+        col = _density_colors(rho)
+    # And we plot it (the colors encode the density, so they are not depth shaded, see plot_model_grid)
+    ax.scatter(points[:, 0], points[:, 1], points[:, 2],
+               marker='.', c=col, s=s, alpha=alpha, depthshade=bw)
     ax.set_xlim([-1, 1])
     ax.set_ylim([-1, 1])
     ax.set_zlim([-1, 1])
     ax.view_init(elev=elev, azim=azim)
     ax.set_axis_off()
 
-    # X Rectangle
-    ax.plot_wireframe(np.asarray([[0, 0], [0, 0]]), np.asarray([[1, 1], [-1, -1]]),
-                      np.asarray([[-1, 1], [-1, 1]]), color="red", linestyle="--", alpha=0.75)
-    # Y Rectangle
-    ax.plot_wireframe(np.asarray([[1, 1], [-1, -1]]), np.asarray([[0, 0], [0, 0]]),
-                      np.asarray([[-1, 1], [-1, 1]]), color="blue", linestyle="--", alpha=0.75)
-    # Z Rectangle
-    ax.plot_wireframe(np.asarray([[-1, 1], [-1, 1]]), np.asarray([[1, 1], [-1, -1]]),
-                      np.asarray([[0, 0], [0, 0]]), color="green", linestyle="--", alpha=0.75)
+    _plot_section_planes(ax)
 
     if views_2d:
         if figure is None:
             ax2 = fig.add_subplot(222)
         else:
             ax2 = figure.get_axes()[1]
-        ax2.scatter(points[:, 0].cpu(), points[:, 1].cpu(),
+        ax2.scatter(points[:, 0], points[:, 1],
                     marker='.', c=col, s=s, alpha=alpha)
         ax2.set_xlim([-1, 1])
         ax2.set_ylim([-1, 1])
@@ -411,7 +455,7 @@ def plot_model_rejection(model, encoding, N=1500, views_2d=False, bw=False, alph
             ax3 = fig.add_subplot(223)
         else:
             ax3 = figure.get_axes()[2]
-        ax3.scatter(points[:, 0].cpu(), points[:, 2].cpu(),
+        ax3.scatter(points[:, 0], points[:, 2],
                     marker='.', c=col, s=s, alpha=alpha)
         ax3.set_xlim([-1, 1])
         ax3.set_ylim([-1, 1])
@@ -427,7 +471,7 @@ def plot_model_rejection(model, encoding, N=1500, views_2d=False, bw=False, alph
             ax4 = fig.add_subplot(224)
         else:
             ax4 = figure.get_axes()[3]
-        ax4.scatter(points[:, 1].cpu(), points[:, 2].cpu(),
+        ax4.scatter(points[:, 1], points[:, 2],
                     marker='.', c=col, s=s, alpha=alpha)
         ax4.set_xlim([-1, 1])
         ax4.set_ylim([-1, 1])
@@ -445,20 +489,136 @@ def plot_model_rejection(model, encoding, N=1500, views_2d=False, bw=False, alph
     return fig
 
 
+def _sample_model_rejection(model, encoding, N, c=1., crop_p=1e-2, progressbar=False, density_offset=None, absolute=False):
+    """Samples points in the [-1,1]**3 cube interpreting the density of the neural model as a probability
+    distribution and performing a rejection sampling approach
+
+    Args:
+        model (callable (N,M)->1): neural model for the asteroid.
+        encoding: the encoding for the neural inputs.
+        N (int): number of points to be sampled.
+        c (float, optional): Normalization constant. Defaults to 1.
+        crop_p (float, optional): all points below this density are rejected. Defaults to 1e-2.
+        progressbar (bool, optional): activates a progressbar. Defaults to False.
+        density_offset (callable, optional): returns a (batch_size,1) density added to the model one for the candidate points. Defaults to None.
+        absolute (bool, optional): uses the absolute value of the density as probability. Defaults to False.
+
+    Returns:
+        torch tensor, torch tensor: the (N,3) sampled points and their (N,) densities (None, None if all points of a batch were rejected)
+    """
+    # The candidates are drawn directly on the device of the model, from a dedicated generator seeded
+    # to always get the same points (without resetting the global torch seed)
+    device = next(model.parameters()).device
+    generator = torch.Generator(device=device).manual_seed(42)
+    # The normalization constant is passed to the compiled step as a 0-d tensor, a float would be specialized
+    # on (i.e. each new value would trigger a new compilation)
+    c = torch.as_tensor(c, dtype=torch.get_default_dtype(), device=device).detach()
+    # The outputs are filled as the points are accepted
+    points = torch.empty(N, 3, device=device)
+    rho = torch.empty(N, device=device)
+    batch_size = 4096
+    found = 0
+    if progressbar:
+        pbar = tqdm(desc="Sampling points...", total=N)
+    # No autograd graph is needed (only for plotting)
+    with _inference(model):
+        while found < N:
+            candidates = torch.rand(batch_size, 3, device=device,
+                                    generator=generator) * 2 - 1
+            thresholds = torch.rand(batch_size, 1, device=device,
+                                    generator=generator) + crop_p
+            rho_offset = None if density_offset is None else density_offset(
+                candidates)
+            rho_candidates, mask = _rejection_step_fused(
+                model, encoding, candidates, thresholds, c, rho_offset, absolute)
+            # Boolean indexing keeps the selection on the device (no per point .item())
+            rho_candidates = rho_candidates[mask]
+            candidates = candidates[mask.squeeze(1)]
+            if len(candidates) == 0:
+                print("All points rejected! Plot is empty, try cropping less?")
+                return None, None
+            # With a low acceptance rate, the following batches are enlarged to need fewer iterations
+            if found == 0:
+                p_accept = len(rho_candidates) / batch_size
+                if p_accept < 0.5:
+                    batch_size = min(_MAX_REJECTION_BATCH_SIZE, max(batch_size, int(
+                        (N - len(rho_candidates)) / max(p_accept, 0.01) * 1.5)))
+            # discard after N
+            take = min(len(rho_candidates), N - found)
+            points[found:found + take] = candidates[:take]
+            rho[found:found + take] = rho_candidates[:take]
+            found += take
+            if progressbar:
+                pbar.update(take)
+    if progressbar:
+        pbar.close()
+    return points, rho
+
+
+def _rejection_step(model, encoding, candidates, thresholds, c, rho_offset, absolute):
+    """Evaluates the density on the rejection sampling candidates and decides which ones are accepted
+
+    Args:
+        model (callable (N,M)->1): neural model for the asteroid.
+        encoding: the encoding for the neural inputs.
+        candidates (torch tensor): (batch_size,3) candidate points
+        thresholds (torch tensor): (batch_size,1) acceptance thresholds
+        c (torch tensor): 0-d normalization constant.
+        rho_offset (torch tensor): (batch_size,1) density added to the model one, or None
+        absolute (bool): uses the absolute value of the density as probability
+
+    Returns:
+        torch tensor, torch tensor: (batch_size,1) densities and acceptance mask
+    """
+    rho = model(encoding(candidates)) * c
+    if rho_offset is not None:
+        rho = rho + rho_offset
+    p = torch.abs(rho) if absolute else rho
+    return rho, p > thresholds
+
+
+# The encoding, model, scaling and acceptance test are compiled together (where available) so that their
+# pointwise ops are fused. The encodings are plain callables, which rules out torch.jit.script
+if hasattr(torch, "compile"):
+    _rejection_step_fused = torch.compile(_rejection_step)
+else:
+    _rejection_step_fused = _rejection_step
+
+
+def _relative_error(model_values, label_values):
+    """Computes the relative L1 error of the predicted accelerations.
+
+    Args:
+        model_values (torch tensor): (N,3) predicted accelerations
+        label_values (torch tensor): (N,3) label accelerations
+
+    Returns:
+        torch tensor: (N,) relative errors
+    """
+    return torch.sum(torch.abs(model_values - label_values), dim=1) / torch.sum(torch.abs(label_values + 1e-8), dim=1)
+
+
+# The differences, absolute values, sums and division are fused in one kernel
+if hasattr(torch, "compile"):
+    _relative_error_fused = torch.compile(_relative_error)
+else:
+    _relative_error_fused = torch.jit.script(_relative_error)
+
+
 def plot_gradients_per_layer(model):
     """Plots mean and max gradients per layer currently stored in model params. Inspired by https://github.com/alwynmathew/gradflow-check
 
     Args:
         model (torch model): Trained network
     """
-    named_params = model.named_parameters()
+    params = [(name, parameter) for name, parameter in model.named_parameters()
+              if parameter.requires_grad and ("bias" not in name)]
     fig = plt.figure()
-    avg_gradient, max_gradient, layers = [], [], []
-    for name, parameter in named_params:
-        if(parameter.requires_grad) and ("bias" not in name):
-            layers.append(name)
-            avg_gradient.append(parameter.grad.abs().mean())
-            max_gradient.append(parameter.grad.abs().max())
+    layers = [name for name, _ in params]
+    # The statistics stay on the device and are copied to the host once
+    gradients = [parameter.grad.abs() for _, parameter in params]
+    avg_gradient = torch.stack([g.mean() for g in gradients]).cpu().numpy()
+    max_gradient = torch.stack([g.max() for g in gradients]).cpu().numpy()
     plt.bar(np.arange(len(max_gradient)),
             max_gradient, alpha=0.5, lw=1, color="lime")
     plt.bar(np.arange(len(max_gradient)),
@@ -498,45 +658,21 @@ def plot_model_vs_mascon_rejection(model, encoding, points, masses=None, N=2500,
     """
 
     # Mascon masses
-    x = points[:, 0].cpu()
-    y = points[:, 1].cpu()
-    z = points[:, 2].cpu()
+    x, y, z = points.detach().float().cpu().numpy().T
 
     s = 22000 / len(points)
 
     if masses is None:
         normalized_masses = s
     else:
-        normalized_masses = masses / sum(masses)
-        normalized_masses = (normalized_masses * s * len(x)).cpu()
+        normalized_masses = (masses / masses.sum() * s * len(x)).detach().cpu().numpy()
 
-    torch.manual_seed(42)  # Seed torch to always get the same points
-    points = []
-    rho = []
-    batch_size = 4096
-    found = 0
-    if progressbar:
-        pbar = tqdm(desc="Sampling points...", total=N)
-    while found < N:
-        candidates = torch.rand(batch_size, 3) * 2 - 1
-        nn_inputs = encoding(candidates)
-        rho_candidates = model(nn_inputs).detach() * c
-        mask = rho_candidates > (torch.rand(batch_size, 1) + crop_p)
-        rho_candidates = rho_candidates[mask]
-        candidates = [[it[0].item(), it[1].item(), it[2].item()]
-                      for it, m in zip(candidates, mask) if m]
-        if len(candidates) == 0:
-            print("All points rejected! Plot is empty, try cropping less?")
-            return
-        points.append(torch.tensor(candidates))
-        rho.append(rho_candidates)
-        found += len(rho_candidates)
-        if progressbar:
-            pbar.update(len(rho))
-    if progressbar:
-        pbar.close()
-    points = torch.cat(points, dim=0)[:N]  # concat and discard after N
-    rho = torch.cat(rho, dim=0)[:N]  # concat and discard after N
+    points, rho = _sample_model_rejection(
+        model, encoding, N, c, crop_p, progressbar)
+    if points is None:
+        return
+    # A single (float32) copy of the samples to the host, all plots use the NumPy arrays
+    points = points.float().cpu().numpy()
 
     fig = plt.figure(dpi=100, facecolor=backcolor)
     ax = fig.add_subplot(221, projection='3d')
@@ -545,7 +681,7 @@ def plot_model_vs_mascon_rejection(model, encoding, points, masses=None, N=2500,
 
     # And we plot it
     ax.scatter(x, y, z, color='k', s=normalized_masses, alpha=0.5)
-    ax.scatter(points[:, 0].cpu(), points[:, 1].cpu(), points[:, 2].cpu(),
+    ax.scatter(points[:, 0], points[:, 1], points[:, 2],
                marker='.', c=col, s=s, alpha=alpha)
     ax.set_xlim([-1, 1])
     ax.set_ylim([-1, 1])
@@ -554,20 +690,12 @@ def plot_model_vs_mascon_rejection(model, encoding, points, masses=None, N=2500,
     ax.axes.xaxis.set_ticklabels([])
     ax.axes.yaxis.set_ticklabels([])
     ax.axes.zaxis.set_ticklabels([])
-    # X Rectangle
-    ax.plot_wireframe(np.asarray([[0, 0], [0, 0]]), np.asarray([[1, 1], [-1, -1]]),
-                      np.asarray([[-1, 1], [-1, 1]]), color="red", linestyle="--", alpha=0.75)
-    # Y Rectangle
-    ax.plot_wireframe(np.asarray([[1, 1], [-1, -1]]), np.asarray([[0, 0], [0, 0]]),
-                      np.asarray([[-1, 1], [-1, 1]]), color="blue", linestyle="--", alpha=0.75)
-    # Z Rectangle
-    ax.plot_wireframe(np.asarray([[-1, 1], [-1, 1]]), np.asarray([[1, 1], [-1, -1]]),
-                      np.asarray([[0, 0], [0, 0]]), color="green", linestyle="--", alpha=0.75)
+    _plot_section_planes(ax)
 
     ax2 = fig.add_subplot(222)
     ax2.set_facecolor(backcolor)
     ax2.scatter(x, y, color='k', s=normalized_masses, alpha=0.5)
-    ax2.scatter(points[:, 0].cpu(), points[:, 1].cpu(),
+    ax2.scatter(points[:, 0], points[:, 1],
                 marker='.', c=col, s=s, alpha=alpha)
     ax2.set_xlim([-1, 1])
     ax2.set_ylim([-1, 1])
@@ -578,7 +706,7 @@ def plot_model_vs_mascon_rejection(model, encoding, points, masses=None, N=2500,
     ax3 = fig.add_subplot(223)
     ax3.set_facecolor(backcolor)
     ax3.scatter(x, z, color='k', s=normalized_masses, alpha=0.5)
-    ax3.scatter(points[:, 0].cpu(), points[:, 2].cpu(),
+    ax3.scatter(points[:, 0], points[:, 2],
                 marker='.', c=col, s=s, alpha=alpha)
     ax3.set_xlim([-1, 1])
     ax3.set_ylim([-1, 1])
@@ -589,7 +717,7 @@ def plot_model_vs_mascon_rejection(model, encoding, points, masses=None, N=2500,
     ax4 = fig.add_subplot(224)
     ax4.set_facecolor(backcolor)
     ax4.scatter(y, z, color='k', s=normalized_masses, alpha=0.5)
-    ax4.scatter(points[:, 1].cpu(), points[:, 2].cpu(),
+    ax4.scatter(points[:, 1], points[:, 2],
                 marker='.', c=col, s=s, alpha=alpha)
     ax4.set_xlim([-1, 1])
     ax4.set_ylim([-1, 1])
@@ -601,9 +729,23 @@ def plot_model_vs_mascon_rejection(model, encoding, points, masses=None, N=2500,
         plt.savefig(save_path, dpi=300)
 
 
+def _slice_mask(coord, offset, thickness):
+    """Selects the points within a slice of the passed thickness around offset (along one axis)
+
+    Args:
+        coord (np.array): coordinates of the points along the slice normal
+        offset (float): position of the slice
+        thickness (float): half thickness of the slice
+
+    Returns:
+        np.array: boolean mask of the points in the slice
+    """
+    return np.abs(coord - offset) < thickness
+
+
 def plot_model_vs_mascon_contours(model, encoding, mascon_points, mascon_masses=None, N=2500, crop_p=1e-2, s=100, save_path=None,
                                   c=1., backcolor=[0.15, 0.15, 0.15], progressbar=False, offset=0.0, heatmap=False, mascon_alpha=0.05,
-                                  add_shape_base_value=None, add_const_density=1.):
+                                  add_shape_base_value=None, add_const_density=1., half_precision=False):
     """Plots both the mascon and model contours in one figure for direct comparison
 
     Args:
@@ -624,12 +766,12 @@ def plot_model_vs_mascon_contours(model, encoding, mascon_points, mascon_masses=
         mascon_alpha (float): alpha of the overlaid mascon model. Defaults to 0.05.
         add_shape_base_value (str): path to asteroid mesh which is then used to add 1 to density inside asteroid
         add_const_density (float): density to add inside asteroid if add_shape_base_value was passed
+        half_precision (bool, optional): evaluates the model in float16 on GPUs (not suited to SIREN models, whose
+                                         sin(omega * x) activations amplify the rounding errors). Defaults to False.
     """
 
     # Mascon masses
-    x = mascon_points[:, 0].cpu()
-    y = mascon_points[:, 1].cpu()
-    z = mascon_points[:, 2].cpu()
+    x, y, z = mascon_points.detach().float().cpu().numpy().T
 
     if add_shape_base_value is not None:
         # Load asteroid triangles
@@ -640,51 +782,29 @@ def plot_model_vs_mascon_contours(model, encoding, mascon_points, mascon_masses=
     s = 22000 / len(mascon_points)
 
     if mascon_masses is None:
-        normalized_masses = torch.tensor(
-            [1./len(mascon_points)] * len(mascon_points))
+        # Equal masses, i.e. 1/len(mascon_points) each
+        normalized_masses = np.full(len(x), s)
     else:
-        normalized_masses = mascon_masses / sum(mascon_masses)
-    normalized_masses = (normalized_masses * s * len(x)).cpu()
+        normalized_masses = (mascon_masses / mascon_masses.sum() * s * len(x)).detach().cpu().numpy()
 
-    torch.manual_seed(42)  # Seed torch to always get the same points
-    points = []
-    rho = []
-    batch_size = 4096
-    found = 0
-    if progressbar:
-        pbar = tqdm(desc="Sampling points...", total=N)
-    while found < N:
-        candidates = torch.rand(batch_size, 3) * 2 - 1
-        nn_inputs = encoding(candidates)
-        rho_candidates = model(nn_inputs).detach() * c
-
-        # Add 1 for points inside asteroid (for differential training / models)
-        if add_shape_base_value is not None:
-            outside_mask = torch.bitwise_not(
+    # Add 1 for points inside asteroid (for differential training / models)
+    if add_shape_base_value is not None:
+        def density_offset(candidates):
+            inside_mask = torch.bitwise_not(
                 is_outside_torch(candidates, triangles))
-            rho_candidates += torch.unsqueeze(outside_mask.float()
-                                              * add_const_density, 1)
-
-        mask = torch.abs(rho_candidates) > (torch.rand(batch_size, 1) + crop_p)
-        rho_candidates = rho_candidates[mask]
-        candidates = [[it[0].item(), it[1].item(), it[2].item()]
-                      for it, m in zip(candidates, mask) if m]
-        if len(candidates) == 0:
-            print("All points rejected! Plot is empty, try cropping less?")
-            return
-        points.append(torch.tensor(candidates))
-        rho.append(rho_candidates)
-        found += len(rho_candidates)
-        if progressbar:
-            pbar.update(len(rho_candidates))
-    if progressbar:
-        pbar.close()
-    points = torch.cat(points, dim=0)[: N]  # concat and discard after N
-    rho = torch.cat(rho, dim=0)[: N]  # concat and discard after N
+            return torch.unsqueeze(inside_mask.float() * add_const_density, 1)
+    else:
+        density_offset = None
+
+    points, rho = _sample_model_rejection(
+        model, encoding, N, c, crop_p, progressbar, density_offset=density_offset, absolute=True)
+    if points is None:
+        return
+    # A single (float32) copy of the samples to the host, all plots use the NumPy arrays
+    points, rho = points.float().cpu().numpy(), rho.float().cpu().numpy()
 
     # levels = np.linspace(0, 2.7, 10)
-    levels = np.linspace(np.min(rho.cpu().detach().numpy()),
-                         np.max(rho.cpu().detach().numpy()), 10)
+    levels = np.linspace(np.min(rho), np.max(rho), 10)
 
     fig = plt.figure(figsize=(6, 6), dpi=100, facecolor='white')
     ax = fig.add_subplot(2, 2, 1, projection='3d')
@@ -694,7 +814,7 @@ def plot_model_vs_mascon_contours(model, encoding, mascon_points, mascon_masses=
 
     # And we plot it
     ax.scatter(x, y, z, color='k', s=normalized_masses, alpha=0.01)
-    ax.scatter(points[:, 0].cpu(), points[:, 1].cpu(), points[:, 2].cpu(),
+    ax.scatter(points[:, 0], points[:, 1], points[:, 2],
                marker='.', c=rejection_col, s=s*2, alpha=0.1)
     ax.set_xlim([-1, 1])
     ax.set_ylim([-1, 1])
@@ -705,25 +825,22 @@ def plot_model_vs_mascon_contours(model, encoding, mascon_points, mascon_masses=
     ax.set_ylabel("Y", fontsize=8)
     ax.set_zlabel("Z", fontsize=8)
 
-    # X Rectangle
-    ax.plot_wireframe(np.asarray([[0, 0], [0, 0]])+offset, np.asarray([[1, 1], [-1, -1]]),
-                      np.asarray([[-1, 1], [-1, 1]]), color="red", linestyle="--", alpha=0.75)
-    # Y Rectangle
-    ax.plot_wireframe(np.asarray([[1, 1], [-1, -1]]), np.asarray([[0, 0], [0, 0]])+offset,
-                      np.asarray([[-1, 1], [-1, 1]]), color="blue", linestyle="--", alpha=0.75)
-    # Z Rectangle
-    ax.plot_wireframe(np.asarray([[-1, 1], [-1, 1]]), np.asarray([[1, 1], [-1, -1]]),
-                      np.asarray([[0, 0], [0, 0]])+offset, color="green", linestyle="--", alpha=0.75)
+    _plot_section_planes(ax, offset=offset)
     ax.set_title("3D View", fontsize=7)
 
     mascon_slice_thickness = 0.01
 
+    # The model is evaluated once on the three sections
+    sections = [np.array([0, 0, 1]), np.array([0, 1, 0]), np.array([1, 0, 0])]
+    densities = _section_densities(model, encoding, sections, offset=offset, c=c,
+                                   add_shape_base_value=add_shape_base_value, add_const_density=add_const_density,
+                                   half_precision=half_precision)
+
     ax2 = fig.add_subplot(2, 2, 2)
     # ax2.set_facecolor(backcolor)
-    mask = torch.logical_and(z - offset < mascon_slice_thickness,
-                             z - offset > -mascon_slice_thickness)
-    _ = plot_model_contours(model, encoding, section=np.array(
-        [0, 0, 1]), axes=ax2, levels=levels, c=c, offset=offset, heatmap=heatmap, add_shape_base_value=add_shape_base_value, add_const_density=add_const_density)
+    mask = _slice_mask(z, offset, mascon_slice_thickness)
+    _ = plot_model_contours(model, encoding, section=sections[0], axes=ax2, levels=levels, c=c, offset=offset,
+                            heatmap=heatmap, density=densities[0])
     ax2.scatter(x[mask], y[mask], color=mascon_color,
                 s=normalized_masses[mask], alpha=mascon_alpha)
 
@@ -741,10 +858,9 @@ def plot_model_vs_mascon_contours(model, encoding, mascon_points, mascon_masses=
 
     ax3 = fig.add_subplot(2, 2, 3)
     # ax3.set_facecolor(backcolor)
-    mask = torch.logical_and(y - offset < mascon_slice_thickness,
-                             y - offset > -mascon_slice_thickness)
-    _ = plot_model_contours(model, encoding, section=np.array(
-        [0, 1, 0]), axes=ax3, levels=levels, c=c, offset=offset, heatmap=heatmap, add_shape_base_value=add_shape_base_value, add_const_density=add_const_density)
+    mask = _slice_mask(y, offset, mascon_slice_thickness)
+    _ = plot_model_contours(model, encoding, section=sections[1], axes=ax3, levels=levels, c=c, offset=offset,
+                            heatmap=heatmap, density=densities[1])
     ax3.scatter(x[mask], z[mask], color=mascon_color,
                 s=normalized_masses[mask], alpha=mascon_alpha)
 
@@ -762,10 +878,9 @@ def plot_model_vs_mascon_contours(model, encoding, mascon_points, mascon_masses=
 
     ax4 = fig.add_subplot(2, 2, 4)
     # ax4.set_facecolor(backcolor)
-    mask = torch.logical_and(x - offset < mascon_slice_thickness,
-                             x - offset > -mascon_slice_thickness)
-    _ = plot_model_contours(model, encoding, section=np.array(
-        [1, 0, 0]), axes=ax4, levels=levels, c=c, offset=offset, heatmap=heatmap, add_shape_base_value=add_shape_base_value, add_const_density=add_const_density)
+    mask = _slice_mask(x, offset, mascon_slice_thickness)
+    _ = plot_model_contours(model, encoding, section=sections[2], axes=ax4, levels=levels, c=c, offset=offset,
+                            heatmap=heatmap, density=densities[2])
     ax4.scatter(y[mask], z[mask], color=mascon_color,
                 s=normalized_masses[mask], alpha=mascon_alpha)
     ax4.set_xlim([-1, 1])
@@ -838,24 +953,14 @@ def plot_model_mascon_acceleration(sample, model, encoding, mascon_points, masco
     # Left and Right refer to values < 0 and > 0 in the non-crosssection dimension
 
     print("Splitting in left / right hemisphere")
-    points_left = points[points[:, cut_dim] < 0]
-    points_right = points[points[:, cut_dim] > 0]
+    left = points[:, cut_dim] < 0
+    right = points[:, cut_dim] > 0
+    points_left = points[left]
+    points_right = points[right]
 
     print("Left: ", len(points_left), " points.")
     print("Right: ", len(points_right), " points.")
 
-    model_values_left = torch.zeros([len(points_left), 3])
-    model_values_right = torch.zeros([len(points_right), 3])
-
-    label_values_left = torch.zeros([len(points_left), 3])
-    label_values_right = torch.zeros([len(points_right), 3])
-
-    model_values_left, label_values_left, relative_error_left = [], [], []
-    model_values_right, label_values_right, relative_error_right = [], [], []
-
-    # Compute accelerations in left points, then right points
-    # for both network and mascon model
-    batch_size = 100
     label_function = ACC_L
     integrator = ACC_trap
 
@@ -871,39 +976,44 @@ def plot_model_mascon_acceleration(sample, model, encoding, mascon_points, masco
         def prediction_adjustment(
             tp, mp, mm): return ACC_L(tp, mp, mm) + c * integrator(tp, model, encoding, N=200000)
 
-    for idx in range((len(points_left) // batch_size)+1):
-        indices = list(range(idx*batch_size,
-                             np.minimum((idx+1)*batch_size, len(points_left))))
-
-        label_values_left.append(
-            label_function(points_left[indices], mascon_points, mascon_masses).detach())
-        model_values_left.append(
-            prediction_adjustment(points_left[indices], mascon_points, mascon_masses).detach())
-
-        torch.cuda.empty_cache()
-
-    for idx in range((len(points_right) // batch_size)+1):
-        indices = list(range(idx*batch_size,
-                             np.minimum((idx+1)*batch_size, len(points_right))))
-
-        label_values_right.append(
-            label_function(points_right[indices], mascon_points, mascon_masses).detach())
-        model_values_right.append(
-            prediction_adjustment(points_right[indices], mascon_points, mascon_masses).detach())
-
-        torch.cuda.empty_cache()
-
-    # Accumulate all results
-    label_values_left = torch.cat(label_values_left)
-    model_values_left = torch.cat(model_values_left)
-    label_values_right = torch.cat(label_values_right)
-    model_values_right = torch.cat(model_values_right)
-
-    # Compute relative errors for each hemisphere (left, right)
-    relative_error_left = (torch.sum(torch.abs(model_values_left - label_values_left), dim=1) /
-                           torch.sum(torch.abs(label_values_left+1e-8), dim=1)).cpu().numpy()
-    relative_error_right = (torch.sum(torch.abs(model_values_right - label_values_right), dim=1) /
-                            torch.sum(torch.abs(label_values_right+1e-8), dim=1)).cpu().numpy()
+    # Compute accelerations in all points for both network and mascon model in one pass, the results
+    # are then split by hemisphere. Without an autograd graph the integrator bounds its memory use itself
+    # (it works on chunks of targets sized from the free memory), so the points are not split in batches,
+    # each of which would evaluate the model on the whole integration grid again
+    with torch.no_grad():
+        label_values = label_function(points, mascon_points, mascon_masses)
+        model_values = prediction_adjustment(
+            points, mascon_points, mascon_masses)
+
+    left, right = left.to(label_values.device), right.to(label_values.device)
+    label_values_left = label_values[left]
+    model_values_left = model_values[left]
+    label_values_right = label_values[right]
+    model_values_right = model_values[right]
+
+    # Compute relative errors for all points at once, then split them by hemisphere (left, right)
+    relative_error = _relative_error_fused(model_values, label_values)
+
+    # Everything the plots need (coordinates and errors of each hemisphere and the mean acceleration magnitudes)
+    # is bundled to be copied to the host at once
+    per_point = torch.stack((points[:, x_dim].to(relative_error), points[:, y_dim].to(relative_error),
+                             relative_error), dim=1)
+    magnitudes = torch.stack([torch.mean(torch.sum(torch.abs(values), dim=1)) for values in (
+        label_values_left, model_values_left, label_values_right, model_values_right)]).to(relative_error)
+    bundle = torch.cat((per_point[left].reshape(-1),
+                        per_point[right].reshape(-1), magnitudes))
+    host_bundle = torch.empty(bundle.shape, dtype=bundle.dtype, device="cpu",
+                              pin_memory=bundle.is_cuda)
+    host_bundle.copy_(bundle, non_blocking=True)
+    if bundle.is_cuda:
+        torch.cuda.synchronize(bundle.device)
+    host_bundle = host_bundle.numpy()
+    per_point_left = host_bundle[:3 * len(points_left)].reshape(-1, 3)
+    per_point_right = host_bundle[3 * len(points_left):-4].reshape(-1, 3)
+    magnitudes = host_bundle[-4:]
+
+    relative_error_left = per_point_left[:, 2]
+    relative_error_right = per_point_right[:, 2]
 
     min_err = np.minimum(np.min(relative_error_left),
                          np.min(relative_error_right))
@@ -917,11 +1027,11 @@ def plot_model_mascon_acceleration(sample, model, encoding, mascon_points, masco
         relative_error_right = np.log(relative_error_right)
 
     # Get X,Y coordinates of analyzed points
-    X_left = points_left[:, x_dim].cpu().numpy()
-    Y_left = points_left[:, y_dim].cpu().numpy()
+    X_left = per_point_left[:, 0]
+    Y_left = per_point_left[:, 1]
 
-    X_right = points_right[:, x_dim].cpu().numpy()
-    Y_right = points_right[:, y_dim].cpu().numpy()
+    X_right = per_point_right[:, 0]
+    Y_right = per_point_right[:, 1]
 
     # Plot left side stuff
     fig = plt.figure(figsize=(8, 4), dpi=100, facecolor='white')
@@ -945,10 +1055,8 @@ def plot_model_mascon_acceleration(sample, model, encoding, mascon_points, masco
     ax.set_title(cut_dim_name + " < 0")
     ax.tick_params(labelsize=7)
     ax.set_aspect('equal', 'box')
-    ax.annotate("Label Acc. Mag=" + str(torch.mean(torch.sum(torch.abs(label_values_left), dim=1)).cpu().numpy()) +
-                "\n" + "Model Acc. Mag=" +
-                str(torch.mean(
-                    torch.sum(torch.abs(model_values_left), dim=1)).cpu().numpy()),
+    ax.annotate("Label Acc. Mag=" + str(magnitudes[0]) +
+                "\n" + "Model Acc. Mag=" + str(magnitudes[1]),
                 (-0.95, 0.8), fontsize=8, color="white")
 
     # Plot right side stuff
@@ -970,10 +1078,8 @@ def plot_model_mascon_acceleration(sample, model, encoding, mascon_points, masco
     ax.set_title(cut_dim_name + " > 0")
     ax.tick_params(labelsize=7)
     ax.set_aspect('equal', 'box')
-    ax.annotate("Label Acc. Mag=" + str(torch.mean(torch.sum(torch.abs(label_values_right), dim=1)).cpu().numpy()) +
-                "\n" + "Model Acc. Mag=" +
-                str(torch.mean(
-                    torch.sum(torch.abs(model_values_right), dim=1)).cpu().numpy()),
+    ax.annotate("Label Acc. Mag=" + str(magnitudes[2]) +
+                "\n" + "Model Acc. Mag=" + str(magnitudes[3]),
                 (-0.95, 0.8), fontsize=8, color="white")
 
     plt.tight_layout()
@@ -985,41 +1091,22 @@ def plot_model_mascon_acceleration(sample, model, encoding, mascon_points, masco
     return ax, label_values_right
 
 
-def plot_model_contours(model, encoding, heatmap=False, section=np.array([0, 0, 1]),
-                        N=100, save_path=None, offset=0., axes=None, c=1., levels=[0.001, 0.01, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7],
-                        add_shape_base_value=None, add_const_density=1.):
-    """Takes a mass density model and plots the density contours of its section with
-       a 2D plane
+def _section_points(section, N=100, offset=0.):
+    """Builds the 2D grid of points on the section of the [-1,1]**3 cube with a plane
 
     Args:
-        model (callable (N,M)->1): neural model for the asteroid.
-        encoding: the encoding for the neural inputs.
-        section (Numpy array (3)): the section normal (can also be not of unitary magnitude)
+        section (Numpy array (3)): the (unitary) section normal
         N (int): number of points in each axis of the 2D grid
-        save_path (str, optional): Pass to store plot, if none will display. Defaults to None.
         offset (float): an offset to apply to the plane in the direction of the section normal
-        axes (matplolib axes): the axes where to plot. Defaults to None, in which case axes are created.
-        levels (list optional): the contour levels to be plotted. Defaults to [0.001, 0.01, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7].
-        add_shape_base_value (str): path to asteroid mesh which is then used to add 1 to density inside asteroid
-        add_const_density (float): density to add inside asteroid if add_shape_base_value was passed
+
+    Returns:
+        np.array: (N**2,3) grid points
     """
     # Builds a 2D grid on the z = 0 plane
     x, y = np.meshgrid(np.linspace(-1, 1, N), np.linspace(-1, 1, N))
-    x = np.reshape(x, (-1,))
-    y = np.reshape(y, (-1,))
-    z = np.zeros(N**2)
-    p = np.zeros((N**2, 3))
-    p[:, 0] = x
-    p[:, 1] = y
-    p[:, 2] = z
-
-    if add_shape_base_value is not None:
-        # Load asteroid triangles
-        with open(add_shape_base_value, "rb") as file:
-            mesh_vertices, mesh_triangles = pk.load(file)
+    p = np.stack((x.ravel(), y.ravel(), np.zeros(N**2)), axis=1)
 
     # The cross product between the vertical and the desired direction ...
-    section = section / np.linalg.norm(section)
     cp = np.cross(np.array([0, 0, 1]), section)
     # safeguard against singularity
     if np.linalg.norm(cp) > 1e-8:
@@ -1033,23 +1120,127 @@ def plot_model_contours(model, encoding, heatmap=False, section=np.array([0, 0,
         rotvec = np.array([0., 0., 0.])
     # ... used to build the rotation matrix
     Rm = rotation.from_rotvec(rotvec).as_matrix()
-    # We rotate the points ...
-    newp = [np.dot(Rm.transpose(), p[i, :]) for i in range(N**2)]
+    # We rotate the points (p_i -> Rm^T p_i, i.e. a single product with the (N**2,3) grid) ...
+    newp = p @ Rm
     # ... and translate
     newp = newp + section * offset
-    # ... and compute them
-    inp = encoding(torch.tensor(newp, dtype=torch.float32))
-    rho = model(inp) * c
+    return newp
+
+
+@functools.lru_cache(maxsize=8)
+def _get_section_grid(N, sections, offset, device):
+    """Builds the 2D grids of several sections of the [-1,1]**3 cube. Results are cached, as the progress plots
+    use the same sections at every call.
+
+    Args:
+        N (int): number of points in each axis of the 2D grids
+        sections (tuple): the (unitary) section normals, as tuples of 3 floats
+        offset (float): an offset to apply to the planes in the direction of the section normals
+        device (str): torch device to put the grid points on
+
+    Returns:
+        np.array, torch tensor: (len(sections)*N**2,3) grid points, as an array and on the device
+    """
+    newp = np.concatenate([_section_points(np.asarray(section), N, offset)
+                           for section in sections])
+    return newp, torch.tensor(newp, dtype=torch.float32, device=device)
+
+
+def _contour_step(model, encoding, points):
+    """Evaluates the (unscaled) model density on the points of the contour plots.
+
+    Args:
+        model (callable (N,M)->1): neural model for the asteroid.
+        encoding: the encoding for the neural inputs.
+        points (torch tensor): (N,3) points
+
+    Returns:
+        torch tensor: (N,1) float32 densities
+    """
+    return model(encoding(points)).float()
+
+
+# The encoding and model are compiled together (where available). The contour grids have a fixed size, so
+# CUDA graphs are captured and the (launch bound) model forward is replayed at each plot. The normalization
+# constant is applied outside, as each new float value would trigger a new compilation
+if hasattr(torch, "compile"):
+    _contour_step_fused = torch.compile(
+        _contour_step, mode="reduce-overhead", dynamic=False)
+else:
+    _contour_step_fused = _contour_step
+
+
+def _section_densities(model, encoding, sections, N=100, offset=0., c=1., add_shape_base_value=None, add_const_density=1.,
+                       half_precision=False):
+    """Computes the model densities on the 2D grids of several sections of the [-1,1]**3 cube, with a
+    single evaluation of the model on all of them
+
+    Args:
+        model (callable (N,M)->1): neural model for the asteroid.
+        encoding: the encoding for the neural inputs.
+        sections (list of Numpy array (3)): the (unitary) section normals
+        N (int): number of points in each axis of the 2D grids
+        offset (float): an offset to apply to the planes in the direction of the section normals
+        c (float, optional): Normalization constant. Defaults to 1.
+        add_shape_base_value (str): path to asteroid mesh which is then used to add 1 to density inside asteroid
+        add_const_density (float): density to add inside asteroid if add_shape_base_value was passed
+        half_precision (bool, optional): evaluates the model under float16 autocast on GPUs. Defaults to False.
+
+    Returns:
+        np.array: (len(sections),N,N) densities
+    """
+    device = next(model.parameters()).device
+    newp, points = _get_section_grid(N, tuple(tuple(float(v) for v in section) for section in sections),
+                                     float(offset), str(device))
+    # ... and compute them (in half precision on GPUs only if requested, the float16 rounding is amplified by
+    # e.g. the sin(omega * x) activations of SIREN models)
+    with _inference(model):
+        with torch.autocast("cuda", dtype=torch.float16, enabled=half_precision and points.is_cuda):
+            rho = _contour_step_fused(model, encoding, points)
+        rho = rho * c
 
     # Add 1 for points inside asteroid (for differential training / models)
     if add_shape_base_value is not None:
+        # Load asteroid triangles
+        with open(add_shape_base_value, "rb") as file:
+            mesh_vertices, mesh_triangles = pk.load(file)
         outside_mask = np.invert(
             is_outside(newp, np.asarray(mesh_vertices),
                        np.asarray(mesh_triangles)))
-        rho += torch.unsqueeze(torch.tensor(outside_mask).float()
-                               * add_const_density, 1)
+        rho = rho + torch.unsqueeze(torch.tensor(outside_mask, device=device).float()
+                                    * add_const_density, 1)
+
+    return rho.reshape((len(sections), N, N)).float().cpu().numpy()
 
-    Z = rho.reshape((N, N)).cpu().detach().numpy()
+
+def plot_model_contours(model, encoding, heatmap=False, section=np.array([0, 0, 1]),
+                        N=100, save_path=None, offset=0., axes=None, c=1., levels=[0.001, 0.01, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7],
+                        add_shape_base_value=None, add_const_density=1., density=None, half_precision=False):
+    """Takes a mass density model and plots the density contours of its section with
+       a 2D plane
+
+    Args:
+        model (callable (N,M)->1): neural model for the asteroid.
+        encoding: the encoding for the neural inputs.
+        section (Numpy array (3)): the section normal (can also be not of unitary magnitude)
+        N (int): number of points in each axis of the 2D grid
+        save_path (str, optional): Pass to store plot, if none will display. Defaults to None.
+        offset (float): an offset to apply to the plane in the direction of the section normal
+        axes (matplolib axes): the axes where to plot. Defaults to None, in which case axes are created.
+        levels (list optional): the contour levels to be plotted. Defaults to [0.001, 0.01, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7].
+        add_shape_base_value (str): path to asteroid mesh which is then used to add 1 to density inside asteroid
+        add_const_density (float): density to add inside asteroid if add_shape_base_value was passed
+        density (np.array, optional): precomputed (N,N) densities on the section (see _section_densities). Defaults to None,
+                                      in which case the model is evaluated.
+        half_precision (bool, optional): evaluates the model in float16 on GPUs (not suited to SIREN models, whose
+                                         sin(omega * x) activations amplify the rounding errors). Defaults to False.
+    """
+    section = section / np.linalg.norm(section)
+    if density is None:
+        density = _section_densities(model, encoding, [section], N=N, offset=offset, c=c,
+                                     add_shape_base_value=add_shape_base_value, add_const_density=add_const_density,
+                                     half_precision=half_precision)[0]
+    Z = density
 
     X, Y = np.meshgrid(np.linspace(-1, 1, N), np.linspace(-1, 1, N))
     if axes is None:
@@ -1,5 +1,6 @@
 import torch
 import matplotlib.pyplot as plt
+import math
 import numpy as np
 import os
 import pickle as pk
@@ -10,9 +11,12 @@ from scipy.spatial import KDTree
 from gravann._utils import unpack_triangle_mesh, get_asteroid_bounding_box
 from gravann._hulls import is_outside_torch, is_outside
 
-# There is no torch.pi so we define it here
+# There is no torch.pi so we define it here (it is also used by gravann._stokes)
 torch.pi = torch.acos(torch.zeros(1)).item() * 2  # which is 3.1415927410125732
 
+# Plain float constant used by the samplers
+_PI = math.pi
+
 
 def get_target_point_sampler(N, method="cubical", bounds=[1.1, 1.2], limit_shape_to_asteroid=None, replace=True):
     """Get a function to sample N target points from. Points may differ each
@@ -22,8 +26,9 @@ def get_target_point_sampler(N, method="cubical", bounds=[1.1, 1.2], limit_shape
         N (int): Number of points to get each call
         radius_bounds (list): Defaults to [1.1, 1.2]. Specifies the sampling radius.
         method (str, optional): Utilized method. Currently supports random points from some volume
-                                (cubical, spherical) or a spherical grid (will not change each
-                                call). Defaults to "cubical".
+                                (cubical, spherical), scrambled Sobol points from the cubical volume
+                                (cubical_sobol) or a spherical grid (will not change each call).
+                                Defaults to "cubical".
         limit_shape_to_asteroid(str, optional): Path to a *.pk file specifies an asteroid shape to exclude from samples
                                                 or use for altitude sampling
         replace (bool, optional): Only altitude. If points are allowed to be sampled twice in the same batch or not
@@ -36,6 +41,8 @@ def get_target_point_sampler(N, method="cubical", bounds=[1.1, 1.2], limit_shape
         # Create point sampler function
         if method == "cubical":
             return lambda: _sample_cubical(N, bounds)
+        elif method == "cubical_sobol":
+            return lambda: _sample_cubical_sobol(N, bounds)
         elif method == "spherical":
             return lambda: _sample_spherical(N, bounds)
         elif method == "spherical_grid":
@@ -209,6 +216,8 @@ def _get_asteroid_limited_sampler(N, method="cubical", bounds=[1.1, 1.2], limit_
     # Create a sampler to get some points
     if method == "cubical":
         def sampler(): return _sample_cubical(sample_step_size, bounds)
+    elif method == "cubical_sobol":
+        def sampler(): return _sample_cubical_sobol(sample_step_size, bounds)
     elif method == "spherical":
         def sampler(): return _sample_spherical(sample_step_size, bounds)
 
@@ -229,7 +238,7 @@ def _get_N_points_outside_asteroid(N, sampler, triangles, sample_step_size):
         torch tensor: sampled points
     """
     # We allocate a few more just to avoid having to check, will discard in return
-    points = torch.zeros([N+sample_step_size, 3],
+    points = torch.empty([N+sample_step_size, 3],
                          device=os.environ["TORCH_DEVICE"])
     found_points = 0
 
@@ -262,17 +271,20 @@ def _get_spherical_grid(N, radius=1.73205):
     Returns:
         [torch tensor]: Points on the sphere.
     """
-    N = int(np.round(np.sqrt(N)))  # 2d grid
-    offset = torch.pi / (N+2)  # Use an offset to avoid singularities at poles
+    N = math.isqrt(N)  # 2d grid
+    offset = _PI / (N+2)  # Use an offset to avoid singularities at poles
     grid_1d = torch.linspace(
-        offset, torch.pi-offset, N, device=os.environ["TORCH_DEVICE"])
-    phi, theta = torch.meshgrid(grid_1d, grid_1d)
-    x = radius * torch.sin(phi) * torch.cos(2*theta)
-    y = radius * torch.sin(phi) * torch.sin(2*theta)
-    z = radius * torch.cos(phi)
-    points = torch.stack((x.flatten(), y.flatten(), z.flatten())).transpose(
-        0, 1).to(os.environ["TORCH_DEVICE"])
-    return points
+        offset, _PI-offset, N, device=os.environ["TORCH_DEVICE"])
+    # phi varies along the rows and theta along the columns ("ij" indexing), the (N,N) values are obtained
+    # by broadcasting instead of materializing the meshgrid
+    phi = grid_1d.view(N, 1)
+    theta = 2 * grid_1d.view(1, N)
+    r_sin_phi = radius * torch.sin(phi)
+    x = r_sin_phi * torch.cos(theta)
+    y = r_sin_phi * torch.sin(theta)
+    z = (radius * torch.cos(phi)).expand(N, N)
+    # Stacking along dim 1 directly gives the contiguous (N,3) points on the device of the grid
+    return torch.stack((x.reshape(-1), y.reshape(-1), z.reshape(-1)), dim=1)
 
 
 def _limit_to_domain(points, domain=[[-1, 1], [-1, 1], [-1, 1]]):
@@ -285,14 +297,12 @@ def _limit_to_domain(points, domain=[[-1, 1], [-1, 1], [-1, 1]]):
     Returns:
         Torch tensor: (Non-proper) subset of the passed points.
     """
-    a = torch.logical_or((points[:, 0] < domain[0][0]),
-                         (points[:, 0] > domain[0][1]))
-    b = torch.logical_or((points[:, 1] < domain[1][0]),
-                         (points[:, 1] > domain[1][1]))
-    c = torch.logical_or((points[:, 2] < domain[2][0]),
-                         (points[:, 2] > domain[2][1]))
-    d = torch.logical_or(torch.logical_or(a, b), c)
-    return points[d]
+    lower = torch.as_tensor([d[0] for d in domain],
+                            dtype=points.dtype, device=points.device)
+    upper = torch.as_tensor([d[1] for d in domain],
+                            dtype=points.dtype, device=points.device)
+    outside = ((points < lower) | (points > upper)).any(dim=1)
+    return points[outside]
 
 
 def _sample_spherical(N, radius_bounds=[1.1, 1.2]):
@@ -305,31 +315,26 @@ def _sample_spherical(N, radius_bounds=[1.1, 1.2]):
     Returns:
         Torch tensor: Sampled points
     """
-    theta = 2.0 * torch.pi * torch.rand(N, 1,
-                                        device=os.environ["TORCH_DEVICE"])
+    # All random numbers are drawn at once, one column each for theta, phi and the radius
+    u = torch.rand(N, 3, device=os.environ["TORCH_DEVICE"])
+    theta = u[:, 0].mul(2.0 * _PI)
 
     # The acos here allows us to sample uniformly on the sphere
-    phi = torch.acos(1.0 - 2.0 * torch.rand(N, 1,
-                                            device=os.environ["TORCH_DEVICE"]))
+    phi = torch.acos(u[:, 1].mul(-2.0).add_(1.0))
 
     minimal_radius_scale = radius_bounds[0] / radius_bounds[1]
     # Create uniform between
-    uni = minimal_radius_scale + \
-        (1.0 - minimal_radius_scale) * \
-        torch.rand(N, 1, device=os.environ["TORCH_DEVICE"])
-    r = radius_bounds[1] * torch.pow(uni, 1/3)
+    uni = u[:, 2].mul(1.0 - minimal_radius_scale).add_(minimal_radius_scale)
+    r = uni.pow_(1/3).mul_(radius_bounds[1])
 
-    x = r * torch.sin(phi) * torch.cos(theta)
-    y = r * torch.sin(phi) * torch.sin(theta)
+    sin_phi = torch.sin(phi)
+    x = r * sin_phi * torch.cos(theta)
+    y = r * sin_phi * torch.sin(theta)
     z = r * torch.cos(phi)
 
-    points = torch.stack((x.flatten(), y.flatten(), z.flatten())).transpose(
-        0, 1).to(os.environ["TORCH_DEVICE"])
-
-    if os.environ["TORCH_DEVICE"] == "cpu":
-        return points
-    else:
-        return points.float()
+    # Stacking along dim 1 directly gives the contiguous (N,3) points (already of the default dtype
+    # on the device)
+    return torch.stack((x.flatten(), y.flatten(), z.flatten()), dim=1)
 
 
 def _sample_cubical(N, scale_bounds=[1.1, 1.2]):
@@ -342,19 +347,50 @@ def _sample_cubical(N, scale_bounds=[1.1, 1.2]):
     Returns:
         Torch tensor: Sampled points
     """
-    # Approximation of percentage points in Unitsphere
-    approx = (scale_bounds[0] / scale_bounds[1])**3
+    s0, s1 = scale_bounds
+    device = os.environ["TORCH_DEVICE"]
 
-    # Sample twice the expected number of points necessary to achieve N
-    approx_necessary_samples = int(2 * N * (1.0 / (1.0 - approx)))
-    points = (torch.rand(approx_necessary_samples, 3,
-                         device=os.environ["TORCH_DEVICE"])*2 - 1)*scale_bounds[1]
+    # The shell between the two cubes is split in three disjoint slabs, the k-th one having its k-th
+    # coordinate in [s0,s1] (in absolute value), the previous ones in [-s0,s0] and the following ones
+    # in [-s1,s1]. A slab is picked for each point according to its volume ...
+    slab_volumes = torch.tensor([s1 * s1, s0 * s1, s0 * s0], device=device)
+    slab = torch.multinomial(slab_volumes, N, replacement=True).view(-1, 1)
+    axes = torch.arange(3, device=device).view(1, -1)
 
-    # Discard points inside unitcube
-    domain = scale_bounds[0]*torch.tensor(
-        [[-1, 1], [-1, 1], [-1, 1]], device=os.environ["TORCH_DEVICE"])
-    points = _limit_to_domain(points, domain)
+    # ... and the point is then drawn uniformly inside it (no rejection needed)
+    u = torch.rand(N, 3, device=device) * 2 - 1
+    half_width = s1 - (s1 - s0) * (axes < slab)
+    slab_coordinate = torch.sign(u) * (s0 + (s1 - s0) * torch.abs(u))
+    return torch.where(axes == slab, slab_coordinate, u * half_width)
+
+
+def _sample_cubical_sobol(N, scale_bounds=[1.1, 1.2]):
+    """Generates N quasi random samples from a cube with passed scale. All points outside unit cube. A freshly
+    scrambled Sobol sequence is drawn at each call and the points inside the inner cube are rejected, which keeps
+    the low discrepancy of the sequence (the samples cover the domain more evenly than random ones).
+
+    Args:
+        N (int): Nr of points to create.
+        scale_bounds (float, optional): Scales of the domain for the points. Defaults to [1.1, 1.2].
+
+    Returns:
+        Torch tensor: Sampled points
+    """
+    s0, s1 = scale_bounds
+    engine = torch.quasirandom.SobolEngine(
+        dimension=3, scramble=True, seed=int(torch.randint(2**31 - 1, (1,), device="cpu")))
+
+    # Expected fraction of the points of the outer cube which are outside the inner one
+    acceptance = 1 - (s0 / s1)**3
+
+    # The sequence is drawn on the CPU, accepted points are moved to the device at once
+    points, found = [], 0
+    while found < N:
+        # The missing points are drawn with some margin, the sequence continues where it stopped if more are needed
+        candidates = (engine.draw(int((N - found) / acceptance * 1.1) + 1,
+                                  dtype=torch.get_default_dtype()) * 2 - 1) * s1
+        candidates = candidates[(torch.abs(candidates) > s0).any(dim=1)]
+        points.append(candidates)
+        found += len(candidates)
+    return torch.cat(points)[:N].to(os.environ["TORCH_DEVICE"])
 
-    # Take first N points (N.B. that in super unlikely event of
-    # less than N points this will not crash. I tried. :))
-    return points[:N]
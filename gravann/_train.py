@@ -1,5 +1,6 @@
 from torch import nn
 import torch
+import os
 import pathlib
 import pandas as pd
 from tqdm import tqdm
@@ -8,10 +9,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pickle as pk
 import time
+import warnings
 
 from gravann._losses import contrastive_loss, zero_L1_loss, normalized_relative_L2_loss, normalized_relative_component_loss
 from gravann._mascon_labels import ACC_L, ACC_L_differential, U_L
 from gravann._sample_observation_points import get_target_point_sampler
+from gravann._integration import _get_compiled_model
 from gravann._io import load_sample, save_results, save_plots
 from gravann._plots import plot_model_rejection, plot_model_vs_mascon_contours
 from gravann._utils import fixRandomSeeds, EarlyStopping
@@ -80,7 +83,8 @@ def init_network(encoding, n_neurons=100, activation=nn.Sigmoid(), model_type="d
 
 
 def train_on_batch(targets, labels, model, encoding, loss_fn, optimizer, scheduler, integrator, N, vision_targets=None, integration_domain=None):
-    """Trains the passed model on the passed batch
+    """Trains the passed model on the passed batch. The LR scheduler should be stepped by the caller with the
+    returned loss (fetching its value needs a host-device sync, which is then done once per iteration)
 
     Args:
         targets (tensor): target points for training
@@ -89,7 +93,8 @@ def train_on_batch(targets, labels, model, encoding, loss_fn, optimizer, schedul
         encoding (func): encoding function for the model
         loss_fn (func): loss function for training
         optimizer (torch optimizer): torch optimizer to use
-        scheduler (torch LR scheduler): torch LR scheduler to use
+        scheduler (torch LR scheduler): Deprecated, pass None and step the scheduler with the returned loss. If a
+                                        scheduler is passed it is still stepped here (with an extra sync).
         integrator (func): integration function to call for the training loss
         N (int): Number of integration points to use for training
         vision_targets (torch.tensor): If not None will eval L1 loss assuming that density at this points should be 0
@@ -98,8 +103,9 @@ def train_on_batch(targets, labels, model, encoding, loss_fn, optimizer, schedul
     Returns:
         torch tensor: losses
     """
-    # Compute the loss (use N=3000 to start with, then, eventually, beef it up to 200000)
-    predicted = integrator(targets, model, encoding,
+    # Compute the loss (use N=3000 to start with, then, eventually, beef it up to 200000). The number of
+    # integration points is fixed, so the integrator evaluates the compiled model
+    predicted = integrator(targets, _get_compiled_model(model), encoding,
                            N=N, domain=integration_domain)
     c = torch.sum(predicted*labels)/torch.sum(predicted*predicted)
     if loss_fn == contrastive_loss or loss_fn == normalized_relative_L2_loss or loss_fn == normalized_relative_component_loss:
@@ -130,8 +136,10 @@ def train_on_batch(targets, labels, model, encoding, loss_fn, optimizer, schedul
     # parameters
     optimizer.step()
 
-    # Perform a step in LR scheduler to update LR
-    scheduler.step(loss.item())
+    if scheduler is not None:
+        warnings.warn("Passing a scheduler to train_on_batch is deprecated, pass None and call "
+                      "scheduler.step with the returned loss instead.", DeprecationWarning)
+        scheduler.step(loss.item())
 
     return loss, c, vision_loss
 
@@ -196,6 +204,31 @@ def _init_training_run(cfg, sample, lr, loss_fn, encoding, batch_size, target_sa
     return model, early_stopper, optimizer, scheduler, targets_point_sampler, visual_target_points_sampler, run_folder
 
 
+def _sample_targets_and_labels(cfg, targets_point_sampler, mascon_points, mascon_masses_u, mascon_masses_nu):
+    """Samples new target points and computes the corresponding labels
+
+    Args:
+        cfg (dict): global run cfg
+        targets_point_sampler (func): sampler for the target points
+        mascon_points (torch.tensor): asteroid mascon points
+        mascon_masses_u (torch.tensor): (uniform) asteroid mascon masses
+        mascon_masses_nu (torch.tensor): non-uniform asteroid mascon masses, None if not differential training
+
+    Returns:
+        torch tensor, torch tensor: target points, labels
+    """
+    target_points = targets_point_sampler()
+    if cfg["model"]["use_acceleration"]:
+        if cfg["training"]["differential_training"]:
+            labels = ACC_L_differential(
+                target_points, mascon_points, mascon_masses_u, mascon_masses_nu)
+        else:
+            labels = ACC_L(target_points, mascon_points, mascon_masses_u)
+    else:
+        labels = U_L(target_points, mascon_points, mascon_masses_u)
+    return target_points, labels
+
+
 def run_training(cfg, sample, loss_fn, encoding, batch_size, target_sample_method, activation, omega, hidden_layers, n_neurons):
     """Runs a specific parameter configuration
     Args:
@@ -223,6 +256,13 @@ def run_training(cfg, sample, loss_fn, encoding, batch_size, target_sample_metho
     loss_log, lr_log, vision_loss_log, weighted_average_log, n_inferences = [], [], [], [], []
     weighted_average = deque([], maxlen=20)
 
+    # On GPU the next target points and labels are prepared on a side stream, overlapping the previous iteration
+    if os.environ["TORCH_DEVICE"].startswith("cuda"):
+        sampler_stream = torch.cuda.Stream()
+    else:
+        sampler_stream = None
+    next_batch = None
+
     t = tqdm(range(cfg["training"]["iterations"]), ncols=150)
     # At the beginning (first plots) we assume no learned c
     c = 1.
@@ -235,49 +275,63 @@ def run_training(cfg, sample, loss_fn, encoding, batch_size, target_sample_metho
             plot_model_vs_mascon_contours(model, encoding, mascon_points, N=cfg["plotting_points"],
                                           save_path=run_folder + "contour_plot_iter" + format(it, '06d') + ".png", c=c)
             plt.close('all')
-        # Each ten epochs we resample the target points
+        # Each ten epochs we resample the target points and generate the labels
         if (it % 10 == 0):
-            target_points = targets_point_sampler()
+            if next_batch is None:
+                target_points, labels = _sample_targets_and_labels(
+                    cfg, targets_point_sampler, mascon_points, mascon_masses_u, mascon_masses_nu)
+            else:
+                torch.cuda.current_stream().wait_stream(sampler_stream)
+                target_points, labels = next_batch
+                # The tensors were allocated on the side stream but are now used (and freed) on this one
+                target_points.record_stream(torch.cuda.current_stream())
+                labels.record_stream(torch.cuda.current_stream())
+                next_batch = None
 
         # will be None if not USE_VISUAL_LOSS
         visual_target_points = visual_target_points_sampler()
 
-        # We generate the labels
-        if cfg["model"]["use_acceleration"]:
-            if cfg["training"]["differential_training"]:
-                labels = ACC_L_differential(
-                    target_points, mascon_points, mascon_masses_u, mascon_masses_nu)
-            else:
-                labels = ACC_L(target_points, mascon_points, mascon_masses_u)
-        else:
-            labels = U_L(target_points, mascon_points, mascon_masses_u)
-
         # Train
         loss, c, vision_loss = train_on_batch(target_points, labels, model, encoding,
-                                              loss_fn, optimizer, scheduler, cfg[
+                                              loss_fn, optimizer, None, cfg[
                                                   "integrator"], cfg["integration"]["points"],
                                               vision_targets=visual_target_points, integration_domain=cfg["integration"]["domain"])
 
+        # Prepare the targets of the next resampling on the side stream while the GPU is still busy with the
+        # training step just enqueued (i.e. before the sync below)
+        if sampler_stream is not None and it % 10 == 9:
+            with torch.cuda.stream(sampler_stream):
+                next_batch = _sample_targets_and_labels(
+                    cfg, targets_point_sampler, mascon_points, mascon_masses_u, mascon_masses_nu)
+
+        # Each .item() is a host-device sync, so the loss is fetched once and reused below
+        loss_value = loss.item()
+
+        # Perform a step in LR scheduler to update LR
+        scheduler.step(loss_value)
+
         # Update the loss trend indicators
-        weighted_average.append(loss.item())
+        weighted_average.append(loss_value)
 
-        # Update the logs
+        # Update the logs (vision losses stay on the device until the end of the training)
         lr_log.append(optimizer.param_groups[0]['lr'])
         weighted_average_log.append(np.mean(weighted_average))
-        loss_log.append(loss.item())
-        vision_loss_log.append(vision_loss.item())
+        loss_log.append(loss_value)
+        vision_loss_log.append(vision_loss.detach().view(-1))
         n_inferences.append((cfg["integration"]["points"]*batch_size) // 1000)
         wa_out = np.mean(weighted_average)
 
-        t.set_postfix_str(
-            f"L={loss.item():.3e} | AvgL={wa_out:.3e} | c={c:.3e} | visionL={vision_loss.item():.3e}")
+        # c and the vision loss need further syncs, so the postfix is only refreshed every few iterations
+        if it % 10 == 0:
+            t.set_postfix_str(
+                f"L={loss_value:.3e} | AvgL={wa_out:.3e} | c={c:.3e} | visionL={vision_loss.item():.3e}")
 
-        if early_stopper.early_stop(loss.item(), model):
+        if early_stopper.early_stop(loss_value, model):
             print(
                 f"Early stopping at minimal loss {early_stopper.minimal_loss}")
             break
+    vision_loss_log = torch.cat(vision_loss_log).cpu().tolist()
 
-        torch.cuda.empty_cache()
     # Restore best checkpoint
     print("Restoring best checkpoint for validation...")
     model.load_state_dict(torch.load(run_folder + "best_model.mdl"))
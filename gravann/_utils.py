@@ -76,6 +76,11 @@ def enableCUDA(device=0):
         print('Active CUDA Device: GPU', torch.cuda.current_device())
         print("Setting default tensor type to Float32")
         torch.set_default_tensor_type(torch.cuda.FloatTensor)
+        # Allow TF32 tensor cores for float32 matmuls and convolutions (Ampere and newer GPUs)
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        if hasattr(torch, "set_float32_matmul_precision"):
+            torch.set_float32_matmul_precision("high")
     else:
         warnings.warn(
             "Error enabling CUDA. cuda.is_available() returned False. CPU will be used.")
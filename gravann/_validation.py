@@ -188,7 +188,6 @@ def validation(model, encoding, mascon_points, mascon_masses,
     ################################################
     # Compute errors at different altitudes
     for idx, altitude in enumerate(sampling_altitudes):
-        torch.cuda.empty_cache()
         pred, labels, loss_values = [], [], []
         target_sampler = get_target_point_sampler(
             N=batch_size, method="altitude",
@@ -206,7 +205,6 @@ def validation(model, encoding, mascon_points, mascon_masses,
 
             if progressbar:
                 pbar.update(batch_size)
-            torch.cuda.empty_cache()
         pred = torch.cat(pred)
         labels = torch.cat(labels)
 
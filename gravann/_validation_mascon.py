@@ -177,7 +177,6 @@ def validation_mascon(
     ################################################
     # Compute errors at different altitudes
     for idx, altitude in enumerate(sampling_altitudes):
-        torch.cuda.empty_cache()
         pred, labels, loss_values = [], [], []
         target_sampler = get_target_point_sampler(
             N=batch_size,
@@ -196,7 +195,6 @@ def validation_mascon(
 
             if progressbar:
                 pbar.update(batch_size)
-            torch.cuda.empty_cache()
         pred = torch.cat(pred)
         labels = torch.cat(labels)
 